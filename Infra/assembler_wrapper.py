@@ -1,6 +1,11 @@
+import io
 import os
-import subprocess
-from collections import OrderedDict
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from Infra.executor import BinaryExecutor
+from Infra.output_cache import OutputCache, binary_digest, digest
+from Infra.timing import phase
 
 
 
@@ -55,146 +60,137 @@ REGISTER_TO_NUMBER = {
 }
 
 
+MEMORY_SIZE = 4096
+
+
 class Assembler(object):
     def __init__(self, input_data=None):
         self.input_data = input_data
-        self.assembly_lines = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self.memory = array("I")
+        # (address of the immediate word, label name, line number) of commands that use a label
+        self.label_fixups = []
+        self.word_commands = []
 
     def set_input_data(self, input_data):
         self.input_data = input_data
 
-
-    def _get_label_from_line(self, line):
-        potential_label = None
-        # Check if there is a label at line
-        if ":" in line:
-            potential_label = line.split(":")[0]
-        return potential_label
-
     def is_word_command(self, line):
-        line = _remove_comments_from_line(line).strip()
-        split_line = line.split()
-        if split_line[0] in ["word", ".word"] and len(split_line) == 3:
-            return True
-        return False
-
-    def handle_word_commands(self, original_output):
-        output_split_lines = original_output.splitlines()
+        return _is_word_command(_remove_comments_from_line(line).split())
 
-        for line in self.input_data.splitlines():
-            if not self.is_word_command(line):
-                continue
+    def handle_word_commands(self, memory):
+        # Words are written in place, later words override earlier words and code
+        for address, data in self.word_commands:
+            if len(memory) <= address:
+                memory.extend([0] * (address + 1 - len(memory)))
+            memory[address] = data
+        return memory
 
-            # Get address and data
-            line = _remove_comments_from_line(line).strip()
-            address, data = line.split()[1:3]
-            address, data = int(address), f"{int(data):05x}".upper()
 
-            # Fill empty lines with zeros if needed
-            while len(output_split_lines) <= int(address):
-                output_split_lines.append(f"{int(0):05x}".upper())
-            # output_split_lines.append(data)
-            output_split_lines[address] = data
-        return os.linesep.join(output_split_lines) + os.linesep
-
-
-    def first_phase(self):
+    def first_phase(self, records):
+        # Encodes every command as soon as it is read, immediates that use a label are left
+        # as fixups for the second phase
         current_address = 0
         label_to_address = {}
-
-        for line in self.input_data.splitlines():
-            if self.is_word_command(line):
-                continue
-
-            assembly_line = AssemblyLine(line)
-            if assembly_line.label is not None:
-                label_to_address[assembly_line.label] = current_address
-            self.assembly_lines[current_address] = assembly_line
-            current_address += assembly_line.length_lines()
+        # Label of a label-only line, belongs to the next instruction
+        pending_label = None
+
+        for record in records:
+            if isinstance(record, LabelRecord):
+                if pending_label is not None:
+                    raise AssemblerException(f"Trying to set 2 labels for the same line (line {record.line_number})")
+                pending_label = record.label
+            elif isinstance(record, WordRecord):
+                self.word_commands.append((record.address, record.data))
+            else:
+                assembly_line = AssemblyLine(record.line, parts=record.parts, line_number=record.line_number)
+                if pending_label is not None:
+                    label_to_address[pending_label] = current_address
+                    pending_label = None
+                command = assembly_line.command
+                if command.should_label_be_replaced:
+                    self.label_fixups.append((current_address + 1, command.imm.value, record.line_number))
+                    command.update_label(0)
+                # Commands are consecutive, so the image always ends at current_address
+                self.memory.extend(assembly_line.encode())
+                current_address += assembly_line.length_lines()
         return label_to_address
 
 
     def second_phase(self, label_to_address):
-        output = ""
-        for _, line in self.assembly_lines.items():
-            line.convert_label_to_address(label_to_address)
-            line_bytes = line.serialize_to_bytes()
-            if len(line_bytes) == 5:
-                output += f"{line_bytes}{os.linesep}"
-            elif len(line_bytes) == 10:
-                output += f"{line_bytes[0:5]}{os.linesep}{line_bytes[5:10]}{os.linesep}"
-            else:
-                raise AssemblerException(f"Invalid amount of bytes in line: {line}")
-
-        return output
-
-
-    def remove_blank_lines(self):
-        input_data_without_blank_lines = []
-        previous_line_label = ""
-
-        for line in self.input_data.splitlines():
-            line = _remove_comments_from_line(line).strip()
-            # If line is blank, continue
-            if line == "":
-                continue
-
-            # Add label from previous line if needed
-            if previous_line_label != "":
-                if len(line.split()) == 6:
-                    raise AssemblerException("Trying to set 2 labels for the same line")
-                line = f"{previous_line_label}: {line}"
-                previous_line_label = ""
-
-            # If line contains only a label, add it to the next line
-            potential_label = self._get_label_from_line(line)
-            if potential_label is not None:
-                parts = line.split()
-                if len(parts) == 1:
-                    # Should save label to the next line
-                    previous_line_label = potential_label
-                    continue
-
-            input_data_without_blank_lines.append(line)
-
-        self.input_data = os.linesep.join(input_data_without_blank_lines)
-
-        return self.input_data
+        for address, label_name, line_number in self.label_fixups:
+            if label_name not in label_to_address:
+                raise AssemblerException(f"Cannot find address of label: {label_name} (line {line_number})")
+            self.memory[address] = label_to_address[label_name] & WORD_MASK
+        return self.memory
+
+    def write_memory(self, memory, sink, chunk_size=1024):
+        for start in range(0, len(memory), chunk_size):
+            sink.write("".join([f"{word:05X}\n" for word in memory[start:start + chunk_size]]))
+
+    def assemble_stream(self, src_iterable, sink):
+        # Reads the source lines lazily and writes the memin words to sink (a text file or
+        # buffer). Returns the amount of words written.
+        self._reset()
+        label_to_address = self.first_phase(tokenize_assembly(src_iterable))
+        memory = self.second_phase(label_to_address)
+        self.handle_word_commands(memory)
+        self.write_memory(memory, sink)
+        return len(memory)
 
     def run(self):
-        self.remove_blank_lines()
         # Returns memin.txt file
-        label_to_address = self.first_phase()
-        output = self.second_phase(label_to_address)
-        output = self.handle_word_commands(output)
-        print("Output:")
-        print(output)
-        return output
+        output = io.StringIO(newline=os.linesep)
+        self.assemble_stream(self.input_data.splitlines(), output)
+        return output.getvalue() or os.linesep
 
 
 class AssemblerTestRunner(object):
-    def __init__(self, assembler_path, test_folder, should_compile=False):
+    def __init__(self, assembler_path, test_folder, should_compile=False, executor=None, cache=None):
         self.c_assembler = os.path.realpath(assembler_path)
         self.assembler = Assembler()
         self.input_data = None
         self.expected_output = None
         self.test_folder = test_folder
+        self.executor = executor or BinaryExecutor()
+        # memin.txt outputs by asm input and assembler binary, see Infra/output_cache.py
+        self.cache = cache if cache is not None else OutputCache.from_environment()
+        self.last_execution = None
 
-    def execute_c_assembler(self, test_asm_path, memin_txt_path):
-        with open (test_asm_path, "w") as f:
-            f.write(self.input_data)
-        test_asm_path = os.path.join(self.test_folder, "test.asm")
-        cmd_args = [test_asm_path, memin_txt_path]
-        command = ["cd", self.test_folder, "&&", self.c_assembler] + cmd_args
-        # TODO: change this to use Popen instead of os.system
-        result = os.system(" ".join(command))
-        if result != 0:
-            raise AssemblerException(f"C assembler failed")
+    def _cache_key(self):
+        return digest(self.input_data, binary_digest(self.c_assembler))
 
+    def execute_c_assembler(self, test_asm_path, memin_txt_path):
+        with phase("assembler.write_asm") as record:
+            with open (test_asm_path, "w") as f:
+                record.wrote(f.write(self.input_data))
+
+        memin_file_names = [os.path.basename(memin_txt_path)]
+        memin_folder = os.path.dirname(memin_txt_path)
+        with phase("assembler.execute") as record:
+            cache_key = self._cache_key() if self.cache is not None else None
+            if cache_key is not None and self.cache.get(cache_key, memin_file_names, memin_folder):
+                self.last_execution = None
+                record.cache_hit = True
+            else:
+                result = self.executor.run([self.c_assembler, test_asm_path, memin_txt_path], cwd=self.test_folder)
+                self.last_execution = result
+                record.add_execution(result)
+                if not result.succeeded():
+                    raise AssemblerException(f"C assembler failed: {result}")
+                if cache_key is not None:
+                    self.cache.put(cache_key, memin_folder, memin_file_names)
+                # Bytes of the input and output of the assembler
+                record.read(os.path.getsize(test_asm_path))
+                record.wrote(os.path.getsize(memin_txt_path))
 
         # Return output from memin
-        with open(memin_txt_path, "r") as f:
-            memin_data =  f.read()
+        with phase("assembler.read_memin") as record:
+            with open(memin_txt_path, "r") as f:
+                memin_data =  f.read()
+            record.read(len(memin_data))
         return memin_data
 
     def set_input_data_from_str(self, input_data):
@@ -210,16 +206,87 @@ class AssemblerTestRunner(object):
         pass
 
     def run(self):
-        expected_output = self.expected_output
-
-        # Run python assembler if specific output not given
-        if not expected_output:
-            expected_output = self.assembler.run()
+        with phase("assembler.run"):
+            expected_output = self.expected_output
+
+            # Run python assembler if specific output not given
+            if not expected_output:
+                with phase("assembler.python"):
+                    expected_output = self.assembler.run()
+
+            test_asm_path = os.path.join(self.test_folder, "test.asm")
+            memin_txt_path = os.path.join(self.test_folder, "memin.txt")
+            c_assembler_output = self.execute_c_assembler(test_asm_path, memin_txt_path)
+            with phase("assembler.compare"):
+                assert expected_output.replace(os.linesep, "\n") == c_assembler_output
+
+
+# Writes every case to its own sub folder, runs the C assembler over them with a pool of
+# workers (each worker owns a chunk of cases) and compares all outputs in a single pass. Every
+# case goes through AssemblerTestRunner.execute_c_assembler, so it uses the output cache.
+class AssemblerBatchRunner(object):
+    def __init__(self, assembler_path, test_folder, workers=None, executor=None, cache=None):
+        self.c_assembler = os.path.realpath(assembler_path)
+        self.test_folder = test_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor or BinaryExecutor()
+        self.cache = cache if cache is not None else OutputCache.from_environment()
+        self.cases = []
+        # ExecutionResult of the C assembler of every case of the last run, None for cache hits
+        self.executions = []
+
+    def add(self, input_data, expected_output=None):
+        # Expected output defaults to the python assembler output
+        if expected_output is None:
+            expected_output = Assembler(input_data).run()
+        self.cases.append((input_data, expected_output.replace(os.linesep, "\n")))
+        return len(self.cases) - 1
+
+    def _case_folder(self, case_index):
+        return os.path.join(self.test_folder, f"case_{case_index:06d}")
+
+    def _execute_case(self, case_index):
+        # Returns the memin.txt output (None if the C assembler failed) and the ExecutionResult
+        case_folder = self._case_folder(case_index)
+        os.makedirs(case_folder, exist_ok=True)
+        runner = AssemblerTestRunner(self.c_assembler, case_folder, executor=self.executor, cache=self.cache)
+        runner.set_input_data_from_str(self.cases[case_index][0])
+        try:
+            output = runner.execute_c_assembler(os.path.join(case_folder, "test.asm"),
+                                                os.path.join(case_folder, "memin.txt"))
+        except AssemblerException:
+            output = None
+        return output, runner.last_execution
+
+    def _execute_chunk(self, case_indexes):
+        return [self._execute_case(case_index) for case_index in case_indexes]
+
+    def execute_c_assembler(self):
+        number_of_cases = len(self.cases)
+        chunk_size = max(1, -(-number_of_cases // self.workers))
+        chunks = [range(start, min(start + chunk_size, number_of_cases))
+                  for start in range(0, number_of_cases, chunk_size)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = [result for chunk_results in executor.map(self._execute_chunk, chunks)
+                       for result in chunk_results]
+        self.executions = [execution for _, execution in results]
+        return [output for output, _ in results]
+
+    def _failure(self, case_index, c_assembler_output):
+        failure = f"{self._case_folder(case_index)}: {self.cases[case_index][0]!r}"
+        execution = self.executions[case_index]
+        if c_assembler_output is None and execution is not None:
+            failure += f"{os.linesep}    {execution}"
+        return failure
 
-        test_asm_path = os.path.join(self.test_folder, "test.asm")
-        memin_txt_path = os.path.join(self.test_folder, "memin.txt")
-        c_assembler_output = self.execute_c_assembler(test_asm_path, memin_txt_path)
-        assert expected_output.replace(os.linesep, "\n") == c_assembler_output
+    def run(self):
+        c_assembler_outputs = self.execute_c_assembler()
+        failed_cases = [case_index for case_index, ((_, expected_output), c_assembler_output)
+                        in enumerate(zip(self.cases, c_assembler_outputs))
+                        if expected_output != c_assembler_output]
+        failures = [self._failure(case_index, c_assembler_outputs[case_index]) for case_index in failed_cases[:10]]
+        assert not failed_cases, f"{len(failed_cases)}/{len(self.cases)} cases failed, first failures:{os.linesep}" + \
+            os.linesep.join(failures)
 
 
 class PythonAssemblerTestRunner(AssemblerTestRunner):
@@ -248,33 +315,42 @@ def num_to_bin(num, wordsize):
     padding_size = wordsize - len(base)
     return '0' * padding_size + base
 
+WORD_SIZE = 20
+WORD_MASK = (1 << WORD_SIZE) - 1
+
+
 class Field(object):
-    def __init__(self, value, size):
+    def __init__(self, value, size, shift=0):
         self.value = value
         self.size = size
+        # Position of the field's lowest bit in the instruction word
+        self.shift = shift
 
     def serialize(self):
         return format(self.value, f'0{self.size}b')
 
+    def encode(self):
+        return self.value << self.shift
+
 class FieldOp(Field):
     def __init__(self, value):
         value = OPCODE_TO_NUMBER[value]
-        super(FieldOp, self).__init__(value, 8)
+        super(FieldOp, self).__init__(value, 8, 12)
 
 class FieldRd(Field):
     def __init__(self, value):
         value = REGISTER_TO_NUMBER[value]
-        super(FieldRd, self).__init__(value, 4)
+        super(FieldRd, self).__init__(value, 4, 8)
 
 class FieldRs(Field):
     def __init__(self, value):
         value = REGISTER_TO_NUMBER[value]
-        super(FieldRs, self).__init__(value, 4)
+        super(FieldRs, self).__init__(value, 4, 4)
 
 class FieldRt(Field):
     def __init__(self, value):
         value = REGISTER_TO_NUMBER[value]
-        super(FieldRt, self).__init__(value, 4)
+        super(FieldRt, self).__init__(value, 4, 0)
 
 class FieldImm(Field):
     def __init__(self, value):
@@ -282,10 +358,15 @@ class FieldImm(Field):
             value = int(value)
         except ValueError:
             pass
-        super(FieldImm, self).__init__(value, 20)
+        super(FieldImm, self).__init__(value, WORD_SIZE)
 
     def serialize(self):
-        return num_to_bin(self.value, 20)
+        return num_to_bin(self.value, WORD_SIZE)
+
+    def encode(self):
+        if not -(1 << (WORD_SIZE - 1)) <= self.value <= WORD_MASK:
+            raise AssemblerException(f"Immediate does not fit in {WORD_SIZE} bits: {self.value}")
+        return self.value & WORD_MASK
 
 
 class CommandRFormat(object):
@@ -308,6 +389,10 @@ class CommandRFormat(object):
             self.rt.serialize(),
         ])
 
+    def encode(self):
+        # Returns the memory words of the command
+        return [self.op.encode() | self.rd.encode() | self.rs.encode() | self.rt.encode()]
+
     def __str__(self):
         packed_data = self.serialize()
         s = ""
@@ -350,6 +435,10 @@ class CommandIFormat(object):
             self.imm.serialize(),
         ])
 
+    def encode(self):
+        # Returns the memory words of the command, the immediate is at the second word
+        return [self.op.encode() | self.rd.encode() | self.rs.encode() | self.rt.encode(), self.imm.encode()]
+
     def __str__(self):
         packed_data = self.serialize()
         s = ""
@@ -372,12 +461,75 @@ def _remove_comments_from_line(line):
     return line.split('#', 1)[0]
 
 
+def _is_word_command(split_line):
+    return len(split_line) == 3 and split_line[0] in ["word", ".word"]
+
+
+class LabelRecord(object):
+    def __init__(self, label, line_number):
+        self.label = label
+        self.line_number = line_number
+
+
+class InstructionRecord(object):
+    def __init__(self, parts, line, line_number):
+        # opcode, rd, rs, rt, imm
+        self.parts = parts
+        self.line = line
+        self.line_number = line_number
+
+
+class WordRecord(object):
+    def __init__(self, address, data, line_number):
+        self.address = address
+        self.data = data
+        self.line_number = line_number
+
+
+def tokenize_assembly(lines):
+    # Single pass over the source lines, yields a record for every label, instruction and .word
+    # command. A label that shares its line with an instruction is yielded right before it.
+    for line_number, raw_line in enumerate(lines, 1):
+        line = _remove_comments_from_line(raw_line).strip()
+        if line == "":
+            continue
+
+        split_line = line.split()
+        if _is_word_command(split_line):
+            try:
+                address, data = int(split_line[1]), int(split_line[2])
+            except ValueError:
+                raise AssemblerException(f"Invalid .word command at line {line_number}: {raw_line}")
+            if not 0 <= address < MEMORY_SIZE:
+                raise AssemblerException(f"Word address is out of memory at line {line_number}: {raw_line}")
+            yield WordRecord(address, data & WORD_MASK, line_number)
+            continue
+
+        if len(split_line) == 1 and ":" in line:
+            yield LabelRecord(line.split(":")[0], line_number)
+            continue
+
+        # Remove commas and split line to parts
+        parts = line.replace("\t", " ").replace(",", " ").split()
+        if len(parts) == 6:
+            yield LabelRecord(parts[0].strip(":"), line_number)
+            parts = parts[1:]
+        elif len(parts) != 5:
+            raise AssemblerException(f"Invalid amount of parts in assembly line {line_number}: {raw_line}")
+        yield InstructionRecord(parts, raw_line, line_number)
+
+
 class AssemblyLine(object):
-    def __init__(self, line):
+    def __init__(self, line, parts=None, line_number=None):
         self.raw_line = line
+        self.line_number = line_number
         self.label = None
 
-        self._parse_line(line)
+        # parts are given when the line was already split by tokenize_assembly
+        if parts is None:
+            self._parse_line(line)
+        else:
+            self._set_parts(parts)
 
     def is_I_format(self):
         # TODO: Is there a situation where this is an I command without imm in one of the regs?
@@ -410,10 +562,15 @@ class AssemblyLine(object):
             self.label = parts[0].strip(":")
             parts = parts[1:]
 
+        self._set_parts(parts)
 
+    def _set_parts(self, parts):
         self.opcode, self.rd, self.rs, self.rt, self.imm = tuple(parts)
 
-        self._pack(self.opcode, self.rd, self.rs, self.rt, self.imm)
+        try:
+            self._pack(self.opcode, self.rd, self.rs, self.rt, self.imm)
+        except KeyError as e:
+            raise AssemblerException(f"Unknown opcode or register {e} in assembly line {self.line_number}: {self.raw_line}")
 
     def _pack(self, opcode, rd, rs, rt, imm):
         if r"$imm" in [rd, rs, rt]:
@@ -424,12 +581,11 @@ class AssemblyLine(object):
     def serialize_to_bits(self):
         return self.command.serialize()
 
+    def encode(self):
+        return self.command.encode()
+
     def serialize_to_bytes(self):
-        hex_command = int(self.serialize_to_bits(), 2)
-        if self.is_I_format():
-            return f"{hex_command:010x}".upper()
-        else:
-            return f"{hex_command:05x}".upper()
+        return "".join(f"{word:05X}" for word in self.encode())
 
     def convert_label_to_address(self, label_to_address):
         if self.command.should_label_be_replaced:
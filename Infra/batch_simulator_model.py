@@ -0,0 +1,111 @@
+import numpy as np
+
+from Infra.assembler_wrapper import OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
+from Infra.simulator_model import MEMORY_SIZE, NUMBER_OF_REGISTERS, SimulatorModelException, parse_hex_lines
+
+
+_IMM = REGISTER_TO_NUMBER["$imm"]
+_ALU_OPCODES = [OPCODE_TO_NUMBER[op] for op in ["add", "sub", "mul", "and", "or", "xor", "sll", "sra", "srl"]]
+_BRANCH_OPCODES = [OPCODE_TO_NUMBER[op] for op in ["beq", "bne", "blt", "bgt", "ble", "bge"]]
+_IO_OPCODES = [OPCODE_TO_NUMBER[op] for op in ["reti", "in", "out"]]
+_JAL = OPCODE_TO_NUMBER["jal"]
+_LW = OPCODE_TO_NUMBER["lw"]
+_SW = OPCODE_TO_NUMBER["sw"]
+_HALT = OPCODE_TO_NUMBER["halt"]
+_NUMBER_OF_OPCODES = len(OPCODE_TO_NUMBER)
+
+
+def _sign_extend_20(words):
+    return np.where(words >= 1 << 19, words - (1 << 20), words).astype(np.int32)
+
+
+# Vectorized version of SimulatorModel for many independent programs that do not use IO
+# registers or interrupts. All programs are stepped together, one instruction per step,
+# and every opcode is applied only to the programs that currently execute it.
+class BatchSimulatorModel(object):
+    def __init__(self, memory, max_cycles=None):
+        memory = np.asarray(memory, dtype=np.int32)
+        if memory.ndim != 2 or memory.shape[1] != MEMORY_SIZE:
+            raise SimulatorModelException(f"Memory must be of shape (N, {MEMORY_SIZE}), got {memory.shape}")
+        number_of_programs = memory.shape[0]
+
+        self.memory = memory.copy()
+        self.registers = np.zeros((number_of_programs, NUMBER_OF_REGISTERS), dtype=np.int32)
+        self.pc = np.zeros(number_of_programs, dtype=np.int64)
+        self.cycles = np.zeros(number_of_programs, dtype=np.int64)
+        self.halted = np.zeros(number_of_programs, dtype=bool)
+        self.max_cycles = max_cycles
+
+    @classmethod
+    def from_memins(cls, memins, max_cycles=None):
+        return cls([parse_hex_lines(memin, MEMORY_SIZE) for memin in memins], max_cycles=max_cycles)
+
+    def step(self):
+        active = np.flatnonzero(~self.halted)
+        if active.size == 0:
+            return
+
+        memory = self.memory
+        registers = self.registers
+        pc = self.pc[active]
+        instruction = memory[active, pc]
+        opcode = instruction >> 12
+        rd = (instruction >> 8) & 0xF
+        rs = (instruction >> 4) & 0xF
+        rt = instruction & 0xF
+
+        if np.isin(opcode, _IO_OPCODES).any() or (opcode >= _NUMBER_OF_OPCODES).any():
+            bad_program = active[np.isin(opcode, _IO_OPCODES) | (opcode >= _NUMBER_OF_OPCODES)][0]
+            raise SimulatorModelException(
+                f"Program {bad_program} executes an unsupported opcode at address {self.pc[bad_program]}, "
+                f"use SimulatorModel for programs with IO or interrupts")
+
+        is_i_format = (rd == _IMM) | (rs == _IMM) | (rt == _IMM)
+        imm = _sign_extend_20(memory[active, (pc + 1) % MEMORY_SIZE])
+        registers[active, _IMM] = np.where(is_i_format, imm, 0)
+        next_pc = (pc + 1 + is_i_format) % MEMORY_SIZE
+
+        a = registers[active, rs]
+        b = registers[active, rt]
+        shift = b & 0x1F
+        # int32 arithmetic wraps around like the 32 bits registers
+        result = np.select(
+            [opcode == op for op in _ALU_OPCODES],
+            [a + b, a - b, a * b, a & b, a | b, a ^ b,
+             a << shift, a >> shift, (a.view(np.uint32) >> shift.astype(np.uint32)).view(np.int32)])
+
+        # Branches
+        conditions = np.select(
+            [opcode == op for op in _BRANCH_OPCODES],
+            [a == b, a != b, a < b, a > b, a <= b, a >= b], default=False)
+        next_pc = np.where(conditions, registers[active, rd] & 0xFFF, next_pc)
+
+        # jal
+        is_jal = opcode == _JAL
+        result = np.where(is_jal, next_pc, result)
+        next_pc = np.where(is_jal, a & 0xFFF, next_pc)
+
+        # Memory access
+        address = (a.astype(np.int64) + b) % MEMORY_SIZE
+        is_lw = opcode == _LW
+        is_sw = opcode == _SW
+        result = np.where(is_lw, _sign_extend_20(memory[active, address]), result)
+        memory[active[is_sw], address[is_sw]] = registers[active[is_sw], rd[is_sw]] & 0xFFFFF
+
+        writes_rd = (np.isin(opcode, _ALU_OPCODES) | is_jal | is_lw) & (rd > _IMM)
+        registers[active[writes_rd], rd[writes_rd]] = result[writes_rd]
+
+        self.halted[active] = opcode == _HALT
+        self.pc[active] = next_pc
+        self.cycles[active] += 1 + is_i_format + (is_lw | is_sw)
+
+    def run(self):
+        while not self.halted.all():
+            if self.max_cycles is not None and (self.cycles[~self.halted] >= self.max_cycles).any():
+                raise SimulatorModelException(f"{np.count_nonzero(~self.halted)} programs did not halt after "
+                                              f"{self.max_cycles} cycles")
+            self.step()
+        return self
+
+    def get_register(self, reg):
+        return self.registers[:, REGISTER_TO_NUMBER[reg]]
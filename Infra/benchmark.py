@@ -0,0 +1,250 @@
+import json
+import os
+import time
+
+import numpy as np
+
+from Infra.assembler_wrapper import Assembler
+from Infra.output_files import TraceFile
+from Infra.simulator_model import IO_REGISTER_TO_NUMBER, MEMORY_SIZE, NUMBER_OF_SECTORS
+
+
+# JSON file with the baseline results, benchmarks are checked against it when it exists
+BASELINE_ENVIRONMENT_VARIABLE = "SIMP_BENCHMARK_BASELINE"
+# Setting it to 1 writes the results of the session to the baseline file
+UPDATE_BASELINE_ENVIRONMENT_VARIABLE = "SIMP_BENCHMARK_UPDATE"
+# Allowed slowdown of the median latency, 0.25 is 25% slower than the baseline
+THRESHOLD_ENVIRONMENT_VARIABLE = "SIMP_BENCHMARK_THRESHOLD"
+REPEATS_ENVIRONMENT_VARIABLE = "SIMP_BENCHMARK_REPEATS"
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEATS = 5
+
+PERCENTILES = [50, 90, 99]
+
+_R_FORMAT_OPCODES = ["add", "sub", "mul", "and", "or", "xor", "sll", "sra", "srl"]
+_REGISTERS = ["$t0", "$t1", "$t2", "$s0", "$s1", "$s2"]
+
+
+class BenchmarkException(Exception):
+    pass
+
+
+def arithmetic_program(number_of_instructions):
+    # Straight line ALU program of number_of_instructions instructions (including the halt). As
+    # many instructions as fit in memory are I-format, up to every other instruction.
+    number_of_i_format = min((number_of_instructions - 1) // 2, MEMORY_SIZE - number_of_instructions)
+    if number_of_i_format < 0:
+        raise BenchmarkException(f"{number_of_instructions} instructions do not fit in memory")
+    i_format_step = (number_of_instructions - 1) // number_of_i_format if number_of_i_format else None
+    lines = []
+    for i in range(number_of_instructions - 1):
+        opcode = _R_FORMAT_OPCODES[i % len(_R_FORMAT_OPCODES)]
+        rd, rs, rt = (_REGISTERS[(i + offset) % len(_REGISTERS)] for offset in range(3))
+        if i_format_step and i % i_format_step == 0 and i // i_format_step < number_of_i_format:
+            lines.append(f"{opcode} {rd}, {rs}, $imm, {i % 31 + 1}")
+        else:
+            lines.append(f"{opcode} {rd}, {rs}, {rt}, 0")
+    lines.append("halt $zero, $zero, $zero, 0")
+    return os.linesep.join(lines) + os.linesep
+
+
+def word_program(number_of_words):
+    # A halt followed by .word commands that fill the rest of memory
+    if number_of_words > MEMORY_SIZE - 1:
+        raise BenchmarkException(f"{number_of_words} words do not fit in memory")
+    lines = ["halt $zero, $zero, $zero, 0"]
+    lines += [f".word {address} {address * 37 % 2**19}" for address in range(MEMORY_SIZE - number_of_words, MEMORY_SIZE)]
+    return os.linesep.join(lines) + os.linesep
+
+
+def disk_program(number_of_sectors=NUMBER_OF_SECTORS, buffer_address=0x800):
+    # Reads every sector into the buffer and writes it back, polling diskstatus after every command
+    io = IO_REGISTER_TO_NUMBER
+    return os.linesep.join([
+        "add $s0, $zero, $zero, 0",
+        f"add $s1, $zero, $imm, {number_of_sectors}",
+        f"add $t0, $zero, $imm, {buffer_address}",
+        f"out $t0, $zero, $imm, {io['diskbuffer']}",
+        "LOOP:",
+        f"out $s0, $zero, $imm, {io['disksector']}",
+        "add $t0, $zero, $imm, 1",
+        f"out $t0, $zero, $imm, {io['diskcmd']}",
+        "WAIT_READ:",
+        f"in $t1, $zero, $imm, {io['diskstatus']}",
+        "bne $imm, $t1, $zero, WAIT_READ",
+        "add $t0, $zero, $imm, 2",
+        f"out $t0, $zero, $imm, {io['diskcmd']}",
+        "WAIT_WRITE:",
+        f"in $t1, $zero, $imm, {io['diskstatus']}",
+        "bne $imm, $t1, $zero, WAIT_WRITE",
+        "add $s0, $s0, $imm, 1",
+        "blt $imm, $s0, $s1, LOOP",
+        "halt $zero, $zero, $zero, 0",
+    ]) + os.linesep
+
+
+def interrupt_program(iterations, timer_max):
+    # Busy loop of iterations iterations with the timer (irq0) and irq2 enabled, the handler counts
+    # the interrupts in $s0
+    io = IO_REGISTER_TO_NUMBER
+    return os.linesep.join([
+        "add $t0, $zero, $imm, HANDLER",
+        f"out $t0, $zero, $imm, {io['irqhandler']}",
+        f"add $t0, $zero, $imm, {timer_max}",
+        f"out $t0, $zero, $imm, {io['timermax']}",
+        "add $t0, $zero, $imm, 1",
+        f"out $t0, $zero, $imm, {io['irq0enable']}",
+        f"out $t0, $zero, $imm, {io['irq2enable']}",
+        f"out $t0, $zero, $imm, {io['timerenable']}",
+        f"add $t1, $zero, $imm, {iterations}",
+        "LOOP:",
+        "add $t2, $t2, $imm, 1",
+        "blt $imm, $t2, $t1, LOOP",
+        "halt $zero, $zero, $zero, 0",
+        "HANDLER:",
+        "add $s0, $s0, $imm, 1",
+        f"out $zero, $zero, $imm, {io['irq0status']}",
+        f"out $zero, $zero, $imm, {io['irq2status']}",
+        "reti $zero, $zero, $zero, 0",
+    ]) + os.linesep
+
+
+def irq2in_data(period, number_of_interrupts):
+    return "".join(f"{period * (i + 1)}\n" for i in range(number_of_interrupts))
+
+
+class BenchmarkResult(object):
+    def __init__(self, name, latencies, instructions=None, cycles=None, max_rss=None):
+        self.name = name
+        # Seconds of every repetition
+        self.latencies = latencies
+        # Instructions and cycles of a single repetition
+        self.instructions = instructions
+        self.cycles = cycles
+        # Peak resident set size of the executed binary in bytes
+        self.max_rss = max_rss
+
+    def summary(self):
+        percentiles = np.percentile(self.latencies, PERCENTILES)
+        summary = {"runs": len(self.latencies), "instructions": self.instructions, "cycles": self.cycles,
+                   "max_rss": self.max_rss}
+        summary.update({f"p{percentile}": float(value) for percentile, value in zip(PERCENTILES, percentiles)})
+        median = summary["p50"]
+        summary["instructions_per_second"] = self.instructions / median if self.instructions and median else None
+        summary["cycles_per_second"] = self.cycles / median if self.cycles and median else None
+        return summary
+
+    def __str__(self):
+        summary = self.summary()
+        s = f"{self.name}: p50 {summary['p50'] * 1000:.3f}ms p90 {summary['p90'] * 1000:.3f}ms"
+        if summary["instructions_per_second"]:
+            s += f", {summary['instructions_per_second']:.0f} instructions/s"
+        if summary["cycles_per_second"]:
+            s += f", {summary['cycles_per_second']:.0f} cycles/s"
+        if self.max_rss:
+            s += f", max RSS {self.max_rss // 1024}KB"
+        return s
+
+
+def _program_instructions(program):
+    # Instructions and .word commands of a program (every line that is not a label)
+    return sum(1 for line in program.splitlines() if line.strip() and not line.strip().endswith(":"))
+
+
+def measure_python_assembler(name, program, repeats):
+    instructions = _program_instructions(program)
+    latencies = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        Assembler(program).run()
+        latencies.append(time.perf_counter() - start_time)
+    return BenchmarkResult(name, latencies, instructions)
+
+
+def measure_binaries(name, runner, program, diskin="", irq2in="", repeats=DEFAULT_REPEATS):
+    # Runs the C assembler and simulator of a SimulatorTestRunner (without its caches, which are
+    # restored afterwards) repeats times, returns the (assembler, simulator) results. Latencies are
+    # the wall clock times of the binaries.
+    assembler_cache, simulator_cache = runner.assembler_runner.cache, runner.simulator_cache
+    runner.assembler_runner.cache = None
+    runner.simulator_cache = None
+    try:
+        runner.set_input_data_from_str(program)
+        runner.set_diskin(diskin)
+        runner.set_irq2in(irq2in)
+        assembler_latencies, simulator_latencies = [], []
+        assembler_rss, simulator_rss = 0, 0
+        for _ in range(repeats):
+            runner.run()
+            assembler_execution = runner.assembler_runner.last_execution
+            assembler_latencies.append(assembler_execution.elapsed_time)
+            assembler_rss = max(assembler_rss, assembler_execution.max_rss or 0)
+            simulator_latencies.append(runner.last_execution.elapsed_time)
+            simulator_rss = max(simulator_rss, runner.last_execution.max_rss or 0)
+    finally:
+        runner.assembler_runner.cache, runner.simulator_cache = assembler_cache, simulator_cache
+
+    with open(runner.cycles_txt_path, "r") as f:
+        cycles = int(f.read().strip() or 0)
+    with TraceFile(runner.trace_txt_path) as trace:
+        instructions = len(trace)
+    return (BenchmarkResult(f"{name}.c_assembler", assembler_latencies, _program_instructions(program),
+                            max_rss=assembler_rss or None),
+            BenchmarkResult(f"{name}.c_simulator", simulator_latencies, instructions, cycles,
+                            max_rss=simulator_rss or None))
+
+
+class Regression(object):
+    def __init__(self, name, baseline_latency, latency, threshold):
+        self.name = name
+        self.baseline_latency = baseline_latency
+        self.latency = latency
+        self.threshold = threshold
+
+    def __str__(self):
+        slowdown = self.latency / self.baseline_latency - 1
+        return f"{self.name}: median latency {self.latency * 1000:.3f}ms is {100 * slowdown:.1f}% slower than the " \
+               f"baseline {self.baseline_latency * 1000:.3f}ms (threshold {100 * self.threshold:.0f}%)"
+
+
+# Summaries of benchmark results by name, stored as JSON
+class Baseline(object):
+    def __init__(self, summaries=None):
+        self.summaries = summaries or {}
+        # Results that were checked against the baseline, see update_checked
+        self.checked_results = []
+
+    @classmethod
+    def load(cls, file_path):
+        if not os.path.exists(file_path):
+            return cls()
+        with open(file_path, "r") as f:
+            data = json.load(f)
+        return cls(data.get("benchmarks", {}))
+
+    def save(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump({"benchmarks": self.summaries}, f, indent=2, sort_keys=True)
+
+    def update(self, result):
+        self.summaries[result.name] = result.summary()
+
+    def update_checked(self):
+        # Replaces the baseline of every checked benchmark by its new result
+        for result in self.checked_results:
+            self.update(result)
+
+    def check(self, result, threshold=DEFAULT_THRESHOLD):
+        self.checked_results.append(result)
+        return self.regression(result, threshold)
+
+    def regression(self, result, threshold=DEFAULT_THRESHOLD):
+        # Returns a Regression when the median latency is slower than the baseline by more than
+        # the threshold, None if it is not or the benchmark has no baseline
+        baseline_summary = self.summaries.get(result.name)
+        if baseline_summary is None or not baseline_summary.get("p50"):
+            return None
+        latency = result.summary()["p50"]
+        if latency > baseline_summary["p50"] * (1 + threshold):
+            return Regression(result.name, baseline_summary["p50"], latency, threshold)
+        return None
@@ -0,0 +1,210 @@
+from Infra.assembler_wrapper import AssemblerException, AssemblyLine, InstructionRecord, WordRecord, tokenize_assembly
+from Infra.hwregtrace import READ, WRITE
+from Infra.simulator_model import DISK_CMD_READ, DISK_CMD_WRITE, DISK_LATENCY, IO_REGISTER_TO_NUMBER
+from Infra.trace_table import instruction_cycles
+
+
+class CycleModelException(Exception):
+    pass
+
+
+_CONTROL_FLOW_OPCODES = ["beq", "bne", "blt", "bgt", "ble", "bge", "jal", "reti"]
+_MEMORY_OPCODES = ["lw", "sw"]
+# Writing these IO registers may start interrupts (which change the executed instructions) or a
+# disk read (which may override the executed commands)
+_UNPREDICTABLE_IO_REGISTERS = [IO_REGISTER_TO_NUMBER[name] for name in ["irq0enable", "irq1enable", "irq2enable",
+                                                                         "irqhandler", "diskcmd"]]
+_CLKS = IO_REGISTER_TO_NUMBER["clks"]
+_TIMER_ENABLE = IO_REGISTER_TO_NUMBER["timerenable"]
+_TIMER_CURRENT = IO_REGISTER_TO_NUMBER["timercurrent"]
+_TIMER_MAX = IO_REGISTER_TO_NUMBER["timermax"]
+_DISK_CMD = IO_REGISTER_TO_NUMBER["diskcmd"]
+_DISK_STATUS = IO_REGISTER_TO_NUMBER["diskstatus"]
+
+# Setting it to 1 makes every SimulatorTestRunner.run() check cycles.txt against the cycle model
+VALIDATE_CYCLES_ENVIRONMENT_VARIABLE = "SIMP_TEST_VALIDATE_CYCLES"
+
+# Conservative throughput of a simulator, used for timeouts of programs that were not executed yet
+DEFAULT_CYCLES_PER_SECOND = 100000
+
+
+def command_cycles(assembly_line):
+    # Every command takes a cycle per memory word (the immediate of I-format commands is fetched on
+    # a cycle of its own) and lw/sw take one more cycle for the memory access
+    return assembly_line.length_lines() + (assembly_line.opcode in _MEMORY_OPCODES)
+
+
+def _static_address(assembly_line):
+    # Address (rs + rt) of an out or sw command when it does not depend on register values, None otherwise
+    if any(reg not in ["$zero", "$imm"] for reg in [assembly_line.rs, assembly_line.rt]):
+        return None
+    if not assembly_line.is_I_format():
+        return 0
+    try:
+        imm = int(assembly_line.imm, 0)
+    except ValueError:
+        return None
+    return imm * ((assembly_line.rs == "$imm") + (assembly_line.rt == "$imm"))
+
+
+def predict_program_cycles(program):
+    # Cycles of a program that executes its commands in order up to the first halt: no branches,
+    # jumps, interrupts or disk commands, and no .word or sw that overrides the executed commands.
+    # Returns None for any other program, their cycles depend on the executed path. The python
+    # tokenizer rejects some programs that the C assembler accepts, those are not predicted either.
+    lines = program.splitlines() if isinstance(program, str) else program
+    try:
+        return _predict_program_cycles(lines)
+    except (AssemblerException, ValueError):
+        return None
+
+
+def _predict_program_cycles(lines):
+    cycles = 0
+    address = 0
+    # Address right after the halt, None until the halt is read
+    end_address = None
+    # Memory addresses written by .word and sw commands
+    written_addresses = []
+    for record in tokenize_assembly(lines):
+        if isinstance(record, WordRecord):
+            written_addresses.append(record.address)
+        elif isinstance(record, InstructionRecord) and end_address is None:
+            assembly_line = AssemblyLine(record.line, parts=record.parts, line_number=record.line_number)
+            if assembly_line.opcode in _CONTROL_FLOW_OPCODES:
+                return None
+            if assembly_line.opcode in ["out", "sw"]:
+                static_address = _static_address(assembly_line)
+                if static_address is None:
+                    return None
+                if assembly_line.opcode == "sw":
+                    written_addresses.append(static_address)
+                elif static_address in _UNPREDICTABLE_IO_REGISTERS:
+                    return None
+            cycles += command_cycles(assembly_line)
+            address += assembly_line.length_lines()
+            if assembly_line.opcode == "halt":
+                end_address = address
+    if end_address is None or any(written_address < end_address for written_address in written_addresses):
+        return None
+    return cycles
+
+
+def trace_cycles(trace_table):
+    # Cycles of the instructions that were executed, interrupts do not cost cycles
+    return int(instruction_cycles(trace_table.instruction).sum())
+
+
+def expected_runtime(cycles, cycles_per_second=DEFAULT_CYCLES_PER_SECOND):
+    return cycles / cycles_per_second
+
+
+class CycleDifference(object):
+    def __init__(self, actual_cycles, trace_prediction, program_prediction=None):
+        self.actual_cycles = actual_cycles
+        # Cycles by the executed instructions of trace.txt, and by the program when it can be
+        # predicted statically
+        self.trace_prediction = trace_prediction
+        self.program_prediction = program_prediction
+
+    def __str__(self):
+        s = f"cycles.txt holds {self.actual_cycles} cycles, the executed instructions of trace.txt take " \
+            f"{self.trace_prediction} cycles"
+        if self.program_prediction is not None:
+            s += f" and the program takes {self.program_prediction} cycles"
+        return s
+
+
+def find_cycle_difference(actual_cycles, trace_table, program=None):
+    # Returns a CycleDifference when cycles.txt does not match the model, None if it does
+    trace_prediction = trace_cycles(trace_table)
+    program_prediction = predict_program_cycles(program) if program is not None else None
+    if actual_cycles == trace_prediction and program_prediction in [None, actual_cycles]:
+        return None
+    return CycleDifference(actual_cycles, trace_prediction, program_prediction)
+
+
+def read_cycles(cycles_txt_path):
+    with open(cycles_txt_path, "r") as f:
+        data = f.read().strip()
+    try:
+        return int(data)
+    except ValueError:
+        raise CycleModelException(f"{cycles_txt_path}: invalid cycle count: {data!r}")
+
+
+class IoTimingState(object):
+    # Cycle counter, timer and disk state of the IO registers, advanced between hwregtrace events.
+    # Every register is updated at the end of every cycle, so an event at cycle c is followed by
+    # the update of cycle c.
+    def __init__(self):
+        self.cycle = 0
+        self.clks = 0
+        self.timer_enable = 0
+        self.timer_current = 0
+        self.timer_max = 0
+        # Reads of diskstatus before this cycle return 1
+        self.disk_busy_until = 0
+        self.timer_known = True
+        self.disk_known = True
+
+    def advance(self, cycle):
+        ticks = cycle - self.cycle
+        self.clks = (self.clks + ticks) & 0xFFFFFFFF
+        if self.timer_enable and ticks:
+            if self.timer_current > self.timer_max:
+                # Counts up to 2^32 before it wraps around, not modeled
+                self.timer_known = False
+            else:
+                self.timer_current = (self.timer_current + ticks) % (self.timer_max + 1)
+        self.cycle = cycle
+
+    def expected_read(self, register):
+        if register == _CLKS:
+            return self.clks
+        if register == _TIMER_CURRENT and self.timer_known:
+            return self.timer_current
+        if register == _DISK_STATUS and self.disk_known:
+            return int(self.cycle < self.disk_busy_until)
+        return None
+
+    def write(self, register, value):
+        if register == _CLKS:
+            self.clks = value
+        elif register == _TIMER_ENABLE:
+            self.timer_enable = value
+        elif register == _TIMER_CURRENT:
+            self.timer_current = value
+            self.timer_known = True
+        elif register == _TIMER_MAX:
+            self.timer_max = value
+        elif register == _DISK_CMD:
+            # Commands are ignored while the disk is busy
+            if value in [DISK_CMD_READ, DISK_CMD_WRITE] and self.cycle >= self.disk_busy_until:
+                self.disk_busy_until = self.cycle + DISK_LATENCY
+        elif register == _DISK_STATUS:
+            self.disk_known = False
+
+
+def io_timing_differences(hwregtrace):
+    # Checks the reads of clks, timercurrent and diskstatus in hwregtrace.txt against the cycle
+    # counter, the timer (counts up to timermax and then restarts from 0) and the disk (busy for
+    # DISK_LATENCY cycles after a command). Returns a description of every read that does not match.
+    state = IoTimingState()
+    differences = []
+    for row in range(len(hwregtrace)):
+        cycle = int(hwregtrace.cycle[row])
+        if cycle < state.cycle:
+            differences.append(f"hwregtrace line {row + 1}: cycle {cycle} is before the previous line")
+            break
+        state.advance(cycle)
+        register = int(hwregtrace.register[row])
+        value = int(hwregtrace.value[row])
+        if hwregtrace.direction[row] == WRITE:
+            state.write(register, value)
+        elif hwregtrace.direction[row] == READ:
+            expected_value = state.expected_read(register)
+            if expected_value is not None and expected_value != value:
+                differences.append(f"hwregtrace line {row + 1}: cycle {cycle} READ {hwregtrace.register_name(row)}"
+                                   f" expected {expected_value:08X}, actual {value:08X}")
+    return differences
@@ -0,0 +1,129 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from Infra.simulator_model import DISK_SIZE, SECTOR_SIZE
+
+
+class DiskImageException(Exception):
+    pass
+
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+# Value of every hex digit character, 0xFF for any other byte
+_HEX_VALUES = np.full(256, 0xFF, dtype=np.uint8)
+for _value, _char in enumerate(b"0123456789abcdef"):
+    _HEX_VALUES[_char] = _value
+    _HEX_VALUES[ord(chr(_char).upper())] = _value
+
+WORD_DIGITS = 5
+
+
+def render_hex_words(words, digits=WORD_DIGITS, line_separator=os.linesep):
+    # Same as line_separator.join(f"{word:05x}" for word in words).encode(), without a python loop
+    words = np.asarray(words, dtype=np.uint32)
+    shifts = np.arange(4 * (digits - 1), -1, -4, dtype=np.uint32)
+    chars = _HEX_DIGITS[(words[:, None] >> shifts) & 0xF]
+    separator = np.frombuffer(line_separator.encode(), dtype=np.uint8)
+    lines = np.concatenate([chars, np.broadcast_to(separator, (len(words), len(separator)))], axis=1)
+    return lines.tobytes()[:-len(separator) or None]
+
+
+def parse_hex_columns(chars):
+    # chars is an (N, digits) uint8 array of hex digit characters (up to 8 digits), returns the
+    # N uint32 values or None if any character is not a hex digit
+    nibbles = _HEX_VALUES[chars]
+    if (nibbles == 0xFF).any():
+        return None
+    shifts = np.arange(4 * (chars.shape[1] - 1), -1, -4, dtype=np.uint32)
+    return (nibbles.astype(np.uint32) << shifts).sum(axis=1, dtype=np.uint32)
+
+
+def _parse_fixed_width(data):
+    # Fast path for files where every line has the same width, returns None for anything else
+    width = data.find(b"\n") + 1
+    if width < 2 or width > 9 or len(data) % width != 0:
+        return None
+    lines = np.frombuffer(data, dtype=np.uint8).reshape(-1, width)
+    if (lines[:, -1] != ord("\n")).any():
+        return None
+    return parse_hex_columns(lines[:, :-1])
+
+
+def parse_hex_words(data, size):
+    # Parses memin/memout/diskin/diskout like data (one hex word per line, LF or CRLF), padding
+    # with zeros up to size
+    if isinstance(data, str):
+        data = data.encode()
+    data = data.replace(b"\r", b"")
+    if data and not data.endswith(b"\n"):
+        data += b"\n"
+
+    words = _parse_fixed_width(data)
+    if words is None:
+        try:
+            words = np.array([int(line, 16) for line in data.split()], dtype=np.uint32)
+        except ValueError as e:
+            raise DiskImageException(f"Invalid hex word: {e}")
+    if len(words) > size:
+        raise DiskImageException(f"Too many words: {len(words)} > {size}")
+    return np.concatenate([words, np.zeros(size - len(words), dtype=np.uint32)])
+
+
+# Disk images are read only, so a random image (and its rendered text) is generated once per seed.
+# Only the most recently used images are kept.
+_random_images = OrderedDict()
+_MAX_RANDOM_IMAGES = 16
+
+
+# Disk contents as a read only uint32 array of DISK_SIZE words
+class DiskImage(object):
+    def __init__(self, words=None):
+        if words is None:
+            words = np.zeros(DISK_SIZE, dtype=np.uint32)
+        words = np.array(words, dtype=np.uint32)
+        if words.shape != (DISK_SIZE,):
+            raise DiskImageException(f"Disk image must have {DISK_SIZE} words, got {words.shape}")
+        words.flags.writeable = False
+        self.words = words
+        self._text = None
+
+    @classmethod
+    def random(cls, seed, size=DISK_SIZE):
+        # First size words are random 20 bits words, the rest are zeros
+        key = (seed, size)
+        if key not in _random_images:
+            words = np.zeros(DISK_SIZE, dtype=np.uint32)
+            words[:size] = np.random.default_rng(seed).integers(0, 1 << 20, size, dtype=np.uint32)
+            _random_images[key] = cls(words)
+            if len(_random_images) > _MAX_RANDOM_IMAGES:
+                _random_images.popitem(last=False)
+        _random_images.move_to_end(key)
+        return _random_images[key]
+
+    @classmethod
+    def parse(cls, data):
+        return cls(parse_hex_words(data, DISK_SIZE))
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, "rb") as f:
+            return cls.parse(f.read())
+
+    def sector(self, sector):
+        return self.words[sector * SECTOR_SIZE:(sector + 1) * SECTOR_SIZE]
+
+    def text(self):
+        # diskin.txt contents, rendered once
+        if self._text is None:
+            self._text = render_hex_words(self.words)
+        return self._text
+
+    def write(self, file_path):
+        with open(file_path, "wb") as f:
+            f.write(self.text())
+
+    def compare_sector(self, sector, words):
+        # Returns the offsets in the sector where the words are different
+        return np.flatnonzero(self.sector(sector) != np.asarray(words, dtype=np.uint32))
@@ -0,0 +1,161 @@
+import os
+import selectors
+import shutil
+import signal
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # rlimits are not available on Windows, only the wall clock timeout is enforced there
+    resource = None
+
+
+DEFAULT_TIMEOUT = 60
+# Seconds the output pipes are read after a timed out binary was killed
+DRAIN_TIMEOUT = 1
+# Sets the CPU time and memory limits before the binary is executed
+LIMITS_SHELL = "/bin/sh"
+
+
+class ExecutionException(Exception):
+    pass
+
+
+class ExecutionResult(object):
+    def __init__(self, args, returncode, stdout, stderr, elapsed_time, timed_out=False, spawn_time=None,
+                 rusage=None):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.elapsed_time = elapsed_time
+        self.timed_out = timed_out
+        # Time until the binary was executed (fork and exec)
+        self.spawn_time = spawn_time
+        # Resource usage of the child process, None where os.wait4 is not available
+        self.user_time = rusage.ru_utime if rusage is not None else None
+        self.system_time = rusage.ru_stime if rusage is not None else None
+        # Peak resident set size in bytes (ru_maxrss is in kilobytes on Linux and in bytes on macOS)
+        self.max_rss = None
+        if rusage is not None:
+            self.max_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+    def succeeded(self):
+        return not self.timed_out and self.returncode == 0
+
+    def __str__(self):
+        if self.timed_out:
+            status = f"timed out after {self.elapsed_time:.3f}s"
+        else:
+            status = f"exited with {self.returncode} after {self.elapsed_time:.3f}s"
+        s = f"{self.args[0]} {status}"
+        if self.stderr:
+            s += f", stderr: {self.stderr.decode(errors='replace').strip()}"
+        return s
+
+
+# Runs binaries directly (without a shell) with a wall clock timeout, optional CPU time and
+# memory rlimits, and captured stdout/stderr
+class BinaryExecutor(object):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, cpu_time_limit=None, memory_limit=None):
+        self.timeout = timeout
+        # CPU time limit in seconds and memory limit (address space) in bytes
+        self.cpu_time_limit = cpu_time_limit
+        self.memory_limit = memory_limit
+
+    def _limited_args(self, args, cwd):
+        # The limits are set by a shell in the child before it executes the binary, so the binary
+        # is limited from its first instruction (preexec_fn is not safe while other threads run, as
+        # in AssemblerBatchRunner, and prlimit after the spawn leaves the start unlimited)
+        binary = args[0] if os.sep in args[0] else shutil.which(args[0])
+        if binary is None or not os.access(os.path.join(cwd or "", binary), os.X_OK):
+            raise ExecutionException(f"Failed to execute {args[0]}: not an executable file")
+        ulimits = []
+        if self.cpu_time_limit is not None:
+            ulimits.append(f"ulimit -t {int(self.cpu_time_limit)}")
+        if self.memory_limit is not None:
+            # In kilobytes
+            ulimits.append(f"ulimit -v {self.memory_limit // 1024}")
+        return [LIMITS_SHELL, "-c", "; ".join(ulimits + ['exec "$@"']), LIMITS_SHELL] + list(args)
+
+    def _has_limits(self):
+        return self.cpu_time_limit is not None or self.memory_limit is not None
+
+    def run(self, args, cwd=None):
+        popen_args = args
+        if self._has_limits():
+            if resource is None:
+                raise ExecutionException("CPU time and memory limits are not supported on this platform")
+            popen_args = self._limited_args(args, cwd)
+
+        start_time = time.monotonic()
+        try:
+            process = subprocess.Popen(popen_args, cwd=cwd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+        except OSError as e:
+            raise ExecutionException(f"Failed to execute {args[0]}: {e}")
+        spawn_time = time.monotonic() - start_time
+
+        with process:
+            if hasattr(os, "wait4"):
+                returncode, stdout, stderr, timed_out, rusage = self._communicate(process, start_time)
+            else:
+                rusage = None
+                try:
+                    stdout, stderr = process.communicate(timeout=self.timeout)
+                    returncode, timed_out = process.returncode, False
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    stdout, stderr = process.communicate()
+                    returncode, timed_out = None, True
+
+        return ExecutionResult(args, returncode, stdout or b"", stderr or b"", time.monotonic() - start_time,
+                               timed_out=timed_out, spawn_time=spawn_time, rusage=rusage)
+
+    def _communicate(self, process, start_time):
+        # Reads stdout and stderr until they are closed and reaps the child with os.wait4 (instead of
+        # Popen.communicate, which reaps it with waitpid), so its resource usage is kept. The child
+        # is killed when the timeout expires.
+        kill_deadline = start_time + self.timeout if self.timeout is not None else None
+        # After the kill the pipes are read for DRAIN_TIMEOUT more seconds at most, a grandchild that
+        # inherited them may keep them open
+        drain_deadline = None
+        timed_out = False
+        output = {process.stdout: [], process.stderr: []}
+        with selectors.DefaultSelector() as selector:
+            for pipe in output:
+                selector.register(pipe, selectors.EVENT_READ)
+            while selector.get_map():
+                now = time.monotonic()
+                if kill_deadline is not None and now >= kill_deadline:
+                    os.kill(process.pid, signal.SIGKILL)
+                    timed_out, kill_deadline, drain_deadline = True, None, now + DRAIN_TIMEOUT
+                if drain_deadline is not None and now >= drain_deadline:
+                    break
+                deadline = kill_deadline if kill_deadline is not None else drain_deadline
+                timeout = deadline - now if deadline is not None else None
+                for key, _ in selector.select(timeout):
+                    data = os.read(key.fd, 32768)
+                    if data:
+                        output[key.fileobj].append(data)
+                    else:
+                        selector.unregister(key.fileobj)
+
+        while True:
+            # The pipes are closed right before the child exits (or by the child itself), so the
+            # child is polled until the deadline
+            pid, status, rusage = os.wait4(process.pid, os.WNOHANG if kill_deadline is not None else 0)
+            if pid == process.pid:
+                break
+            if time.monotonic() >= kill_deadline:
+                os.kill(process.pid, signal.SIGKILL)
+                timed_out, kill_deadline = True, None
+            else:
+                time.sleep(0.001)
+        # Tells Popen that the child was reaped
+        process.returncode = os.waitstatus_to_exitcode(status)
+        stdout, stderr = (b"".join(output[pipe]) for pipe in [process.stdout, process.stderr])
+        return None if timed_out else process.returncode, stdout, stderr, timed_out, rusage
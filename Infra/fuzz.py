@@ -0,0 +1,219 @@
+import os
+import random
+import string
+
+from Infra.assembler_wrapper import OPCODE_TO_NUMBER, REGISTER_TO_NUMBER, MEMORY_SIZE
+
+
+OPCODES = list(OPCODE_TO_NUMBER.keys())
+REGISTERS = list(REGISTER_TO_NUMBER.keys())
+REGISTER_SLOTS = ["rd", "rs", "rt"]
+# (name, lowest value, highest value) of the immediate values
+IMM_RANGES = [
+    ("zero", 0, 0),
+    ("small", 1, 255),
+    ("small_negative", -255, -1),
+    ("large", 256, 2**19 - 2),
+    ("large_negative", -2**19 + 1, -256),
+    ("max", 2**19 - 1, 2**19 - 1),
+    ("min", -2**19, -2**19),
+]
+WORD_ADDRESS_RANGES = [("first", 0, 0), ("low", 1, 255), ("high", 256, MEMORY_SIZE - 1)]
+WORD_VALUE_RANGES = [("positive", 0, 2**19 - 1), ("negative", -2**19, -1)]
+SEPARATORS = 10 * [" "] + ["\t", "\t\t", "  ", " \t ", "\t \t"]
+
+
+# Random commands of the global random module (seeded per test, see Infra/seeds.py)
+def generate_random_command(newline=True, add_random_chars=True):
+    opcode = random.choice(OPCODES)
+    rt = random.choice(REGISTERS)
+    rs = random.choice(REGISTERS)
+    rd = random.choice(REGISTERS)
+    if add_random_chars:
+        break1, break2, break3, break4 = (random.choice(SEPARATORS) for _ in range(4))
+        command = f"{opcode}{break1}{rt},{break2}{rs},{break3}{rd},{break4}0"
+    else:
+        command = f"{opcode} {rt}, {rs}, {rd}, 0"
+    if newline:
+        command += os.linesep
+    return command
+
+
+def generate_random_command_with_label(label, newline=True):
+    opcode = random.choice(OPCODES)
+    rt, rs, rd = (random.choice([reg for reg in REGISTERS if reg != "$imm"]) for _ in range(3))
+    command = f"{opcode} {rt}, {rs}, {rd}, {label}"
+    if newline:
+        command += os.linesep
+    return command
+
+
+def coverage_points():
+    # Every combination the generator tries to cover:
+    # ("register", opcode, slot, register), ("imm", opcode, imm range), ("label", opcode) and
+    # ("word", address range, value range)
+    points = [("register", opcode, slot, reg) for opcode in OPCODES for slot in REGISTER_SLOTS for reg in REGISTERS]
+    points += [("imm", opcode, imm_range[0]) for opcode in OPCODES for imm_range in IMM_RANGES]
+    points += [("label", opcode) for opcode in OPCODES]
+    points += [("word", address_range[0], value_range[0])
+               for address_range in WORD_ADDRESS_RANGES for value_range in WORD_VALUE_RANGES]
+    return points
+
+
+COMMAND_KINDS = ["register", "imm", "label"]
+WORD_KINDS = ["word"]
+
+
+def reachable_kinds(number_of_commands, number_of_labels, number_of_words):
+    # Kinds of points that programs of these sizes can cover (label points need labels)
+    kinds = []
+    if number_of_commands:
+        kinds += COMMAND_KINDS if number_of_labels else [kind for kind in COMMAND_KINDS if kind != "label"]
+    if number_of_words:
+        kinds += WORD_KINDS
+    return kinds
+
+
+class CoverageTracker(object):
+    def __init__(self):
+        self.counts = {point: 0 for point in coverage_points()}
+        # Uncovered points of every kind as a list (for sampling) and their positions (for removal in O(1))
+        self._uncovered = {}
+        for point in self.counts:
+            self._uncovered.setdefault(point[0], []).append(point)
+        self._uncovered_index = {point: i for points in self._uncovered.values() for i, point in enumerate(points)}
+
+    def add(self, points):
+        for point in points:
+            self.counts[point] += 1
+            index = self._uncovered_index.pop(point, None)
+            if index is not None:
+                uncovered = self._uncovered[point[0]]
+                last_point = uncovered.pop()
+                if index < len(uncovered):
+                    uncovered[index] = last_point
+                    self._uncovered_index[last_point] = index
+
+    def uncovered(self):
+        return list(self._uncovered_index)
+
+    def sample_uncovered(self, rng, kinds):
+        # Uniform over the uncovered points of the given kinds, None if they are all covered
+        number_of_points = sum(len(self._uncovered[kind]) for kind in kinds)
+        if not number_of_points:
+            return None
+        index = rng.randrange(number_of_points)
+        for kind in kinds:
+            if index < len(self._uncovered[kind]):
+                return self._uncovered[kind][index]
+            index -= len(self._uncovered[kind])
+
+    def ratio(self):
+        return 1 - len(self._uncovered_index) / len(self.counts)
+
+    def is_complete(self, kinds=None):
+        # Every point (of the given kinds) was covered
+        if kinds is None:
+            return not self._uncovered_index
+        return not any(self._uncovered.get(kind) for kind in kinds)
+
+    def __str__(self):
+        covered = len(self.counts) - len(self._uncovered_index)
+        return f"Coverage {covered}/{len(self.counts)} ({100 * self.ratio():.1f}%)"
+
+
+# Generates random assembly programs, biased towards the coverage points that were not generated
+# yet. With probability uncovered_bias a command (or .word) is built around an uncovered point
+# and its other fields are random, otherwise it is fully random.
+class ProgramGenerator(object):
+    def __init__(self, rng=None, uncovered_bias=0.8, coverage=None):
+        # Seeded from the global random module by default, so programs are reproduced by the test seed
+        self.random = rng or random.Random(random.getrandbits(64))
+        self.uncovered_bias = uncovered_bias
+        self.coverage = coverage or CoverageTracker()
+        self._imm_ranges = {name: (low, high) for name, low, high in IMM_RANGES}
+        self._word_address_ranges = {name: (low, high) for name, low, high in WORD_ADDRESS_RANGES}
+        self._word_value_ranges = {name: (low, high) for name, low, high in WORD_VALUE_RANGES}
+
+    def _target(self, kinds):
+        if self.random.random() < self.uncovered_bias:
+            return self.coverage.sample_uncovered(self.random, kinds)
+        return None
+
+    def _command(self, target, labels):
+        rng = self.random
+        opcode = target[1] if target is not None else rng.choice(OPCODES)
+        registers = {slot: rng.choice(REGISTERS) for slot in REGISTER_SLOTS}
+        if target is not None and target[0] == "register":
+            registers[target[2]] = target[3]
+        elif target is not None and "$imm" not in registers.values():
+            # The immediate (or label) is encoded only by I-format commands
+            registers[rng.choice(REGISTER_SLOTS)] = "$imm"
+        is_i_format = "$imm" in registers.values()
+
+        points = [("register", opcode, slot, reg) for slot, reg in registers.items()]
+        if labels and (target is not None and target[0] == "label" or target is None and rng.random() < 0.2):
+            imm = rng.choice(labels)
+            imm_point = ("label", opcode)
+        else:
+            imm_range = target[2] if target is not None and target[0] == "imm" else rng.choice(IMM_RANGES)[0]
+            imm = rng.randint(*self._imm_ranges[imm_range])
+            imm_point = ("imm", opcode, imm_range)
+        if is_i_format:
+            points.append(imm_point)
+
+        separators = [rng.choice(SEPARATORS) for _ in range(4)]
+        command = f"{opcode}{separators[0]}{registers['rd']},{separators[1]}{registers['rs']}," \
+                  f"{separators[2]}{registers['rt']},{separators[3]}{imm}"
+        return command, points
+
+    def _word_command(self, target):
+        rng = self.random
+        if target is not None:
+            address_range, value_range = target[1], target[2]
+        else:
+            address_range, value_range = rng.choice(WORD_ADDRESS_RANGES)[0], rng.choice(WORD_VALUE_RANGES)[0]
+        address = rng.randint(*self._word_address_ranges[address_range])
+        value = rng.randint(*self._word_value_ranges[value_range])
+        return f".word {address} {value}", [("word", address_range, value_range)]
+
+    def _label_name(self, index):
+        letters = "".join(self.random.choice(string.ascii_letters) for _ in range(self.random.randint(1, 8)))
+        return f"{letters}{index}"
+
+    def program(self, number_of_commands, number_of_labels=1, number_of_words=0):
+        # Labels are placed right before random commands (never before another label or a .word)
+        # and .word commands at random positions
+        rng = self.random
+        labels = [self._label_name(i) for i in range(min(number_of_labels, number_of_commands))]
+        command_kinds = reachable_kinds(number_of_commands, len(labels), 0)
+        lines = []
+        points = []
+        for _ in range(number_of_commands):
+            command, command_points = self._command(self._target(command_kinds), labels)
+            lines.append(command)
+            points += command_points
+        for label, line_index in zip(labels, rng.sample(range(number_of_commands), len(labels))):
+            lines[line_index] = f"{label}:{os.linesep}{lines[line_index]}"
+        for _ in range(number_of_words):
+            word_command, word_points = self._word_command(self._target(WORD_KINDS))
+            # Labels share a line with their command, so a .word never separates them
+            line_index = rng.randrange(len(lines) + 1) if lines else 0
+            lines.insert(line_index, word_command)
+            points += word_points
+        self.coverage.add(points)
+        return os.linesep.join(lines) + os.linesep
+
+    def batch(self, number_of_programs, number_of_commands, number_of_labels=1, number_of_words=0):
+        return [self.program(number_of_commands, number_of_labels, number_of_words)
+                for _ in range(number_of_programs)]
+
+    def until_covered(self, number_of_commands, number_of_labels=1, number_of_words=1, batch_size=16,
+                      max_programs=10000):
+        # Generates batches until every coverage point that these programs can cover was generated
+        # (or max_programs), returns all programs
+        kinds = reachable_kinds(number_of_commands, number_of_labels, number_of_words)
+        programs = []
+        while not self.coverage.is_complete(kinds) and len(programs) < max_programs:
+            programs += self.batch(batch_size, number_of_commands, number_of_labels, number_of_words)
+        return programs
@@ -0,0 +1,100 @@
+import numpy as np
+
+from Infra.simulator_model import IO_REGISTERS
+
+
+class HwRegTraceException(Exception):
+    pass
+
+
+READ = 0
+WRITE = 1
+_DIRECTIONS = {b"READ": READ, b"WRITE": WRITE}
+# Both reserved registers are written as "reserved", they are reported as the first one
+_IO_REGISTER_IDS = {}
+for _number, _name in enumerate(IO_REGISTERS):
+    _IO_REGISTER_IDS.setdefault(_name.encode(), _number)
+
+
+def _register_id(register):
+    if isinstance(register, str):
+        if register.encode() not in _IO_REGISTER_IDS:
+            raise HwRegTraceException(f"Unknown IO register: {register}")
+        return _IO_REGISTER_IDS[register.encode()]
+    return register
+
+
+# hwregtrace.txt events as columns in file order: cycle (uint64), direction (READ/WRITE),
+# register (IO register number) and value (uint32). Every register has an index of its rows,
+# which are ordered by cycle, so cycle range queries are binary searches.
+class HwRegTrace(object):
+    def __init__(self, cycle, direction, register, value):
+        self.cycle = np.asarray(cycle, dtype=np.uint64)
+        self.direction = np.asarray(direction, dtype=np.uint8)
+        self.register = np.asarray(register, dtype=np.uint8)
+        self.value = np.asarray(value, dtype=np.uint32)
+        # Rows of every register, built on the first query
+        self._register_rows = None
+
+    @classmethod
+    def parse(cls, data):
+        if isinstance(data, str):
+            data = data.encode()
+        fields = data.split()
+        if len(fields) % 4 != 0:
+            raise HwRegTraceException("Invalid hwregtrace, expected 4 fields per line")
+        try:
+            cycle = np.array(fields[0::4], dtype=np.uint64)
+            direction = [_DIRECTIONS[field] for field in fields[1::4]]
+            register = [_IO_REGISTER_IDS[field] for field in fields[2::4]]
+            value = [int(field, 16) for field in fields[3::4]]
+        except (KeyError, ValueError) as e:
+            raise HwRegTraceException(f"Invalid hwregtrace field: {e}")
+        return cls(cycle, direction, register, value)
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, "rb") as f:
+            return cls.parse(f.read())
+
+    def __len__(self):
+        return len(self.cycle)
+
+    def _rows_of_register(self, register):
+        if self._register_rows is None:
+            # Stable sort keeps the file order of the events of every register
+            order = np.argsort(self.register, kind="stable")
+            boundaries = np.searchsorted(self.register[order], np.arange(len(IO_REGISTERS) + 1))
+            self._register_rows = [order[boundaries[i]:boundaries[i + 1]] for i in range(len(IO_REGISTERS))]
+        return self._register_rows[_register_id(register)]
+
+    def events(self, register=None, direction=None, start_cycle=0, end_cycle=None):
+        # Rows of the events in cycles [start_cycle, end_cycle), in file order
+        if register is None:
+            rows = np.arange(len(self))
+        else:
+            rows = self._rows_of_register(register)
+        cycles = self.cycle[rows]
+        start = np.searchsorted(cycles, start_cycle, side="left")
+        end = len(rows) if end_cycle is None else np.searchsorted(cycles, end_cycle, side="left")
+        rows = rows[start:end]
+        if direction is not None:
+            rows = rows[self.direction[rows] == direction]
+        return rows
+
+    def writes(self, register, start_cycle=0, end_cycle=None):
+        # (cycles, values) of the writes to a register
+        rows = self.events(register, WRITE, start_cycle, end_cycle)
+        return self.cycle[rows], self.value[rows]
+
+    def reads(self, register, start_cycle=0, end_cycle=None):
+        rows = self.events(register, READ, start_cycle, end_cycle)
+        return self.cycle[rows], self.value[rows]
+
+    def value_at(self, register, cycle):
+        # Last value written to a register before the cycle, None if it was never written
+        _, values = self.writes(register, 0, cycle)
+        return int(values[-1]) if values.size else None
+
+    def register_name(self, row):
+        return IO_REGISTERS[self.register[row]]
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from Infra.assembler_wrapper import Assembler, AssemblerException, AssemblerTestRunner
+from Infra.executor import ExecutionException
+from Infra.output_cache import digest
+from Infra.simulator_wrapper import SimulatorTestRunner, SimulatorException
+
+
+class MinimizerException(Exception):
+    pass
+
+
+def assembler_oracle(assembler_path, scratch_folder, executor=None):
+    # A program fails when the python and C assemblers disagree: different memin.txt, or only one
+    # of them rejects the program. Programs that crash the python assembler have no expected output
+    # and do not fail.
+    os.makedirs(scratch_folder, exist_ok=True)
+
+    def oracle(program):
+        try:
+            expected_output = Assembler(program).run().replace(os.linesep, "\n")
+        except AssemblerException:
+            expected_output = None
+        except Exception:
+            return False
+        test_folder = tempfile.mkdtemp(prefix="candidate_", dir=scratch_folder)
+        try:
+            runner = AssemblerTestRunner(assembler_path, test_folder, executor=executor)
+            runner.set_input_data_from_str(program)
+            try:
+                c_assembler_output = runner.execute_c_assembler(os.path.join(test_folder, "test.asm"),
+                                                                os.path.join(test_folder, "memin.txt"))
+            except AssemblerException:
+                c_assembler_output = None
+            return expected_output != c_assembler_output
+        finally:
+            shutil.rmtree(test_folder, ignore_errors=True)
+    return oracle
+
+
+def simulator_oracle(assembler_path, simulator_path, scratch_folder, is_failure, executor=None):
+    # A program fails when is_failure(runner) returns True after it was simulated, programs that do
+    # not assemble or simulate (for example, a removed halt makes the simulator time out) pass
+    os.makedirs(scratch_folder, exist_ok=True)
+
+    def oracle(program):
+        test_folder = tempfile.mkdtemp(prefix="candidate_", dir=scratch_folder)
+        try:
+            runner = SimulatorTestRunner(assembler_path, simulator_path, test_folder, executor=executor)
+            # Failures are decided by is_failure only, not by the cycle model
+            runner.validate_cycles = False
+            runner.set_input_data_from_str(program)
+            runner.run()
+            return is_failure(runner)
+        except (AssemblerException, SimulatorException, ExecutionException):
+            return False
+        finally:
+            shutil.rmtree(test_folder, ignore_errors=True)
+    return oracle
+
+
+# Delta debugging (ddmin) over the lines of a program: instructions, labels and .word commands.
+# oracle(program) returns True while the program still fails. The candidates of every round are
+# checked in parallel, and the verdict of every candidate is cached by its hash.
+class Minimizer(object):
+    def __init__(self, oracle, workers=None):
+        self.oracle = oracle
+        self.workers = workers or os.cpu_count() or 1
+        self.verdicts = {}
+        self.checks = 0
+
+    @staticmethod
+    def _join(lines):
+        return os.linesep.join(lines) + os.linesep
+
+    def _check_all(self, executor, candidates):
+        programs = [self._join(lines) for lines in candidates]
+        keys = [digest(program) for program in programs]
+        new_candidates = {key: program for key, program in zip(keys, programs) if key not in self.verdicts}
+        for key, verdict in zip(new_candidates, executor.map(self.oracle, new_candidates.values())):
+            self.verdicts[key] = verdict
+        self.checks += len(new_candidates)
+        return [self.verdicts[key] for key in keys]
+
+    def minimize(self, program):
+        lines = [line for line in program.splitlines() if line.strip()]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            if not self._check_all(executor, [lines])[0]:
+                raise MinimizerException("The program does not fail, nothing to minimize")
+
+            granularity = 2
+            while len(lines) >= 2:
+                chunk_size = -(-len(lines) // granularity)
+                chunks = [lines[start:start + chunk_size] for start in range(0, len(lines), chunk_size)]
+                complements = [lines[:start] + lines[start + chunk_size:] for start in range(0, len(lines), chunk_size)]
+                # Subsets first, then complements, like ddmin
+                candidates = chunks + complements if len(chunks) > 2 else chunks
+                verdicts = self._check_all(executor, candidates)
+
+                failing_index = next((i for i, verdict in enumerate(verdicts) if verdict), None)
+                if failing_index is not None and failing_index < len(chunks):
+                    lines = chunks[failing_index]
+                    granularity = 2
+                elif failing_index is not None:
+                    lines = complements[failing_index - len(chunks)]
+                    granularity = max(granularity - 1, 2)
+                elif granularity >= len(lines):
+                    break
+                else:
+                    granularity = min(granularity * 2, len(lines))
+        return self._join(lines)
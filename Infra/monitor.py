@@ -0,0 +1,102 @@
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from Infra.disk_image import parse_hex_words
+from Infra.simulator_model import MONITOR_SIZE, MONITOR_WIDTH
+
+
+class MonitorException(Exception):
+    pass
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def write_png(file_path, pixels):
+    # Writes an (H, W) grayscale or (H, W, 3) RGB uint8 image, without an imaging library
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    color_type = 2 if pixels.ndim == 3 else 0
+    height, width = pixels.shape[:2]
+    # Every row starts with filter type 0 (none)
+    rows = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1)
+    with open(file_path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(_png_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)))
+        f.write(_png_chunk(b"IDAT", zlib.compress(rows.tobytes())))
+        f.write(_png_chunk(b"IEND", b""))
+
+
+class MonitorDifference(object):
+    def __init__(self, mask):
+        # (256, 256) bool array, True where the pixels are different
+        self.mask = mask
+        self.count = int(np.count_nonzero(mask))
+        # (first row, first column, last row, last column) of the different pixels
+        self.bounding_box = None
+        if self.count:
+            rows = np.flatnonzero(mask.any(axis=1))
+            columns = np.flatnonzero(mask.any(axis=0))
+            self.bounding_box = (int(rows[0]), int(columns[0]), int(rows[-1]), int(columns[-1]))
+
+    def __bool__(self):
+        return self.count > 0
+
+    def __str__(self):
+        if not self.count:
+            return "Monitor frames are equal"
+        first_row, first_column, last_row, last_column = self.bounding_box
+        return f"{self.count} monitor pixels are different, rows {first_row}-{last_row}, " \
+               f"columns {first_column}-{last_column}"
+
+
+# 256x256 gray scale monitor frame buffer, pixel (row, column) is at monitor address row * 256 + column
+class MonitorFrame(object):
+    def __init__(self, pixels=None):
+        if pixels is None:
+            pixels = np.zeros(MONITOR_SIZE, dtype=np.uint8)
+        pixels = np.asarray(pixels, dtype=np.uint8)
+        if pixels.size != MONITOR_SIZE:
+            raise MonitorException(f"Monitor frame must have {MONITOR_SIZE} pixels, got {pixels.size}")
+        self.pixels = pixels.reshape(MONITOR_WIDTH, MONITOR_WIDTH)
+
+    @classmethod
+    def from_yuv(cls, file_path):
+        pixels = np.fromfile(file_path, dtype=np.uint8, count=MONITOR_SIZE)
+        if pixels.size != MONITOR_SIZE:
+            raise MonitorException(f"{file_path}: expected {MONITOR_SIZE} bytes, got {pixels.size}")
+        return cls(pixels)
+
+    @classmethod
+    def parse_txt(cls, data):
+        # monitor.txt has one 2 hex digits pixel per line, trailing zero pixels are not written
+        words = parse_hex_words(data, MONITOR_SIZE)
+        if (words > 0xFF).any():
+            raise MonitorException(f"Invalid monitor pixel value: {words.max():X}")
+        return cls(words)
+
+    @classmethod
+    def from_txt(cls, file_path):
+        with open(file_path, "rb") as f:
+            return cls.parse_txt(f.read())
+
+    @classmethod
+    def from_file(cls, file_path):
+        if os.path.splitext(file_path)[1] == ".yuv":
+            return cls.from_yuv(file_path)
+        return cls.from_txt(file_path)
+
+    def diff(self, reference):
+        return MonitorDifference(self.pixels != reference.pixels)
+
+    def write_png(self, file_path):
+        write_png(file_path, self.pixels)
+
+    def write_diff_png(self, reference, file_path):
+        # Reference frame in gray with the different pixels in red
+        image = np.repeat(reference.pixels[:, :, None], 3, axis=2)
+        image[self.pixels != reference.pixels] = (0xFF, 0, 0)
+        write_png(file_path, image)
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import shutil
+import tempfile
+
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+# Setting this environment variable enables the cache for runners that were not given one
+CACHE_FOLDER_ENVIRONMENT_VARIABLE = "SIMP_TEST_CACHE"
+CACHE_MAX_SIZE_ENVIRONMENT_VARIABLE = "SIMP_TEST_CACHE_MAX_SIZE"
+
+# Binary digests by (path, mtime, size), binaries are hashed again only after they are rebuilt
+_binary_digests = {}
+
+
+def digest(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        # Length prefix so different splits of the same bytes do not collide
+        h.update(len(part).to_bytes(8, "little"))
+        h.update(part)
+    return h.hexdigest()
+
+
+def binary_digest(binary_path):
+    stat = os.stat(binary_path)
+    stat_key = (binary_path, stat.st_mtime_ns, stat.st_size)
+    if stat_key not in _binary_digests:
+        h = hashlib.sha256()
+        with open(binary_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                h.update(block)
+        _binary_digests[stat_key] = h.hexdigest()
+    return _binary_digests[stat_key]
+
+
+# Content addressed cache of output files on disk. Every entry is a folder named by its key
+# that holds the cached files. Entries are immutable once written, a hit only updates the
+# entry mtime which is used for LRU eviction once the total size is over max_size.
+class OutputCache(object):
+    def __init__(self, cache_folder, max_size=DEFAULT_MAX_SIZE):
+        self.cache_folder = cache_folder
+        self.max_size = max_size
+        # Total size estimate, computed on first put and refreshed by every eviction
+        self._total_size = None
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.cache_folder, exist_ok=True)
+
+    @classmethod
+    def from_environment(cls):
+        cache_folder = os.environ.get(CACHE_FOLDER_ENVIRONMENT_VARIABLE)
+        if not cache_folder:
+            return None
+        max_size = int(os.environ.get(CACHE_MAX_SIZE_ENVIRONMENT_VARIABLE, DEFAULT_MAX_SIZE))
+        return cls(cache_folder, max_size=max_size)
+
+    def _entry_folder(self, key):
+        return os.path.join(self.cache_folder, key[:2], key)
+
+    def _entries(self):
+        for prefix in os.listdir(self.cache_folder):
+            prefix_folder = os.path.join(self.cache_folder, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_folder):
+                continue
+            for key in os.listdir(prefix_folder):
+                yield os.path.join(prefix_folder, key)
+
+    @staticmethod
+    def _entry_size(entry_folder):
+        try:
+            return sum(entry.stat().st_size for entry in os.scandir(entry_folder))
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _link_or_copy(source_path, dest_path):
+        # Hardlinks share the cached inode, so dest_path must be replaced and never written in place
+        try:
+            os.unlink(dest_path)
+        except FileNotFoundError:
+            pass
+        try:
+            os.link(source_path, dest_path)
+        except FileNotFoundError:
+            # Evicted entry, reported as a miss by get
+            raise
+        except OSError:
+            # Different file systems or no hardlink support
+            shutil.copyfile(source_path, dest_path)
+
+    def get(self, key, file_names, dest_folder, link=False):
+        # Copies (or hardlinks, when link is set) the cached files to dest_folder, returns False on a miss
+        entry_folder = self._entry_folder(key)
+        materialize = self._link_or_copy if link else shutil.copyfile
+        try:
+            os.utime(entry_folder)
+            for file_name in file_names:
+                materialize(os.path.join(entry_folder, file_name), os.path.join(dest_folder, file_name))
+        except FileNotFoundError:
+            # Missing or evicted by another process in the middle
+            self.misses += 1
+            return False
+        self.hits += 1
+        return True
+
+    def put(self, key, source_folder, file_names):
+        entry_folder = self._entry_folder(key)
+        if os.path.isdir(entry_folder):
+            return
+        os.makedirs(os.path.dirname(entry_folder), exist_ok=True)
+        # Written aside and renamed so readers never see a partial entry
+        temp_folder = tempfile.mkdtemp(prefix=".tmp_", dir=self.cache_folder)
+        for file_name in file_names:
+            shutil.copyfile(os.path.join(source_folder, file_name), os.path.join(temp_folder, file_name))
+        try:
+            os.rename(temp_folder, entry_folder)
+        except OSError:
+            # Another process already stored the same entry
+            shutil.rmtree(temp_folder, ignore_errors=True)
+            return
+
+        if self._total_size is None:
+            self._total_size = sum(self._entry_size(entry) for entry in self._entries())
+        else:
+            self._total_size += self._entry_size(entry_folder)
+        if self._total_size > self.max_size:
+            self.evict()
+
+    def evict(self):
+        # Removes the least recently used entries until the cache is under max_size
+        entries = []
+        for entry_folder in self._entries():
+            try:
+                entries.append((os.stat(entry_folder).st_mtime_ns, entry_folder, self._entry_size(entry_folder)))
+            except FileNotFoundError:
+                continue
+        entries.sort()
+        total_size = sum(size for _, _, size in entries)
+        for _, entry_folder, size in entries:
+            if total_size <= self.max_size:
+                break
+            shutil.rmtree(entry_folder, ignore_errors=True)
+            total_size -= size
+        self._total_size = total_size
+
+    def clear(self):
+        for entry_folder in list(self._entries()):
+            shutil.rmtree(entry_folder, ignore_errors=True)
+        self._total_size = 0
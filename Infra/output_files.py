@@ -0,0 +1,269 @@
+import mmap
+import os
+from array import array
+from collections import deque
+
+
+NUMBER_OF_TRACE_REGISTERS = 16
+COMPARE_BLOCK_SIZE = 64 * 1024
+# Amount of equal lines shown before a difference
+CONTEXT_LINES = 2
+
+
+class OutputFileException(Exception):
+    pass
+
+
+def _count_line_endings(data):
+    # mmap has no count(), counted by blocks to avoid copying a whole file
+    return sum(data[start:start + COMPARE_BLOCK_SIZE].count(b"\n") for start in range(0, len(data), COMPARE_BLOCK_SIZE))
+
+
+# Read only, memory mapped view of a text output file with random access by line. Lines of
+# fixed-width files (trace.txt, memout.txt, diskout.txt) are found by arithmetic, any other file
+# is indexed once by line offsets. Lines are returned without their LF or CRLF ending.
+# Opening a file only reads its first line, so fixed width is a guess by the first line and the
+# size. Every line that is read is checked, and a file that turns out not to be fixed width is
+# indexed by line offsets from then on (its length may change). validate() checks the whole file.
+class MappedTextFile(object):
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self._file = open(file_path, "rb")
+        try:
+            self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            self._data = b""
+        self._line_offsets = None
+        self._record_size = None
+        self._number_of_lines = None
+        self._detect_fixed_width()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._data = b""
+        self._file.close()
+
+    def _detect_fixed_width(self):
+        data = self._data
+        size = len(data)
+        first_line_end = data.find(b"\n")
+        if first_line_end == -1:
+            self._number_of_lines = 1 if size else 0
+            self._record_size = size + 1
+            return
+        record_size = first_line_end + 1
+        line_ending_size = 2 if first_line_end > 0 and data[first_line_end - 1] == ord("\r") else 1
+        if size % record_size == 0:
+            number_of_lines = size // record_size
+        elif size % record_size == record_size - line_ending_size:
+            # Last line without a line ending
+            number_of_lines = size // record_size + 1
+        else:
+            return
+        if number_of_lines > 1 and data[(number_of_lines - 1) * record_size - 1] != ord("\n"):
+            return
+        self._record_size = record_size
+        self._number_of_lines = number_of_lines
+
+    def _has_record_width(self, block):
+        # Line endings are at the end of every record of the block (which starts at a record) and
+        # nowhere else, the last line of the file may have no line ending
+        number_of_records = len(block) // self._record_size
+        return block[self._record_size - 1::self._record_size] == b"\n" * number_of_records and \
+            _count_line_endings(block) == number_of_records
+
+    def validate(self):
+        # Checks every line of a fixed-width file (reads the whole file), returns is_fixed_width()
+        if self._record_size is not None and not self._has_record_width(self._data):
+            self._build_line_offsets()
+        return self.is_fixed_width()
+
+    def _build_line_offsets(self):
+        data = self._data
+        line_offsets = array("Q")
+        position = 0
+        while position < len(data):
+            line_offsets.append(position)
+            line_end = data.find(b"\n", position)
+            if line_end == -1:
+                break
+            position = line_end + 1
+        self._line_offsets = line_offsets
+        self._number_of_lines = len(line_offsets)
+        self._record_size = None
+
+    def is_fixed_width(self):
+        return self._record_size is not None
+
+    def line_width(self):
+        # Width of every line without its line ending, only for fixed-width files
+        if self._record_size is None:
+            return None
+        line_end = self._record_size - 1
+        return line_end - 1 if line_end > 0 and self._data[line_end - 1] == ord("\r") else line_end
+
+    def record_size(self):
+        # Width of every line with its line ending, only for fixed-width files
+        return self._record_size
+
+    def raw_lines(self, start, stop):
+        # Raw bytes of lines start to stop (including line endings) of a fixed-width file, None when
+        # these lines show that the file is not fixed width
+        block = self._data[start * self._record_size:stop * self._record_size]
+        if not self._has_record_width(block):
+            self._build_line_offsets()
+            return None
+        return block
+
+    def __len__(self):
+        if self._number_of_lines is None:
+            self._build_line_offsets()
+        return self._number_of_lines
+
+    def _line_bounds(self, line_number):
+        data = self._data
+        if self._record_size is not None:
+            start = line_number * self._record_size
+            end = min(start + self._record_size - 1, len(data))
+            if (start == 0 or data[start - 1] == ord("\n")) and (end == len(data) or data[end] == ord("\n")) and \
+                    data.find(b"\n", start, end) == -1:
+                return start, end
+            # Not really fixed width
+            self._build_line_offsets()
+            if line_number >= self._number_of_lines:
+                raise IndexError(f"{self.file_path}: line {line_number} out of range ({self._number_of_lines} lines)")
+        elif self._line_offsets is None:
+            self._build_line_offsets()
+        start = self._line_offsets[line_number]
+        end = data.find(b"\n", start)
+        return start, len(data) if end == -1 else end
+
+    def line(self, line_number):
+        if line_number < 0:
+            line_number += len(self)
+        if not 0 <= line_number < len(self):
+            raise IndexError(f"{self.file_path}: line {line_number} out of range ({len(self)} lines)")
+        start, end = self._line_bounds(line_number)
+        line = self._data[start:end]
+        return line[:-1] if line.endswith(b"\r") else line
+
+    def __getitem__(self, line_number):
+        return self.line(line_number)
+
+    def __iter__(self):
+        # Streams the lines in file order, only the pages of the current line are touched
+        data = self._data
+        size = len(data)
+        position = 0
+        while position < size:
+            end = data.find(b"\n", position)
+            if end == -1:
+                end = size
+            line = data[position:end]
+            yield line[:-1] if line.endswith(b"\r") else line
+            position = end + 1
+
+
+# memout.txt/diskout.txt reader, words after the last line (trailing zeros are not written) are zeros
+class HexWordsFile(MappedTextFile):
+    def word(self, address):
+        if address >= len(self):
+            return 0
+        return int(self.line(address), 16)
+
+    def words(self, start, count):
+        return [self.word(address) for address in range(start, start + count)]
+
+
+class TraceRecord(object):
+    def __init__(self, pc, instruction, registers):
+        self.pc = pc
+        self.instruction = instruction
+        self.registers = registers
+
+    def __str__(self):
+        return f"{self.pc:03X} {self.instruction:05X} " + " ".join(f"{value:08X}" for value in self.registers)
+
+
+# trace.txt reader, line i is the instruction executed at step i
+class TraceFile(MappedTextFile):
+    def record(self, line_number):
+        fields = self.line(line_number).split()
+        if len(fields) != NUMBER_OF_TRACE_REGISTERS + 2:
+            raise OutputFileException(f"{self.file_path}: invalid trace line {line_number}")
+        return TraceRecord(int(fields[0], 16), int(fields[1], 16), [int(field, 16) for field in fields[2:]])
+
+    def records(self):
+        for line_number in range(len(self)):
+            yield self.record(line_number)
+
+
+def iter_lines(file_path, block_size=COMPARE_BLOCK_SIZE):
+    # Reads the file in blocks and yields its lines without their LF or CRLF ending
+    with open(file_path, "rb") as f:
+        pending = b""
+        for block in iter(lambda: f.read(block_size), b""):
+            lines = (pending + block).split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                yield line[:-1] if line.endswith(b"\r") else line
+        if pending:
+            yield pending[:-1] if pending.endswith(b"\r") else pending
+
+
+class FileDifference(object):
+    def __init__(self, file_path, line_number, expected_line, actual_line, context):
+        self.file_path = file_path
+        # 1 based, like text editors
+        self.line_number = line_number
+        self.expected_line = expected_line
+        self.actual_line = actual_line
+        # Lines before the difference, equal in both files
+        self.context = context
+        self.column = next((i + 1 for i, (a, b) in enumerate(zip(expected_line, actual_line)) if a != b),
+                           min(len(expected_line), len(actual_line)) + 1)
+
+    def __str__(self):
+        lines = [f"{self.file_path}: line {self.line_number}, column {self.column}"]
+        for i, line in enumerate(self.context, self.line_number - len(self.context)):
+            lines.append(f"    {i:>6}: {line.decode(errors='replace')}")
+        lines.append(f"  - {self.line_number:>6}: {self.expected_line.decode(errors='replace')}")
+        lines.append(f"  + {self.line_number:>6}: {self.actual_line.decode(errors='replace')}")
+        lines.append(" " * (11 + self.column) + "^")
+        return os.linesep.join(lines)
+
+
+def find_first_difference(base_path, actual_path, block_size=COMPARE_BLOCK_SIZE):
+    # Streams both files (LF and CRLF are equal) and returns the first FileDifference, or None.
+    # Lines that actual_path has after the end of base_path may only be zeros (for example,
+    # memout.txt with trailing zeros), lines missing from actual_path are not checked.
+    context = deque(maxlen=CONTEXT_LINES)
+    actual_lines = iter_lines(actual_path, block_size)
+    line_number = 0
+    for base_line in iter_lines(base_path, block_size):
+        actual_line = next(actual_lines, None)
+        if actual_line is None:
+            return None
+        line_number += 1
+        if base_line != actual_line:
+            return FileDifference(actual_path, line_number, base_line, actual_line, list(context))
+        context.append(base_line)
+    for actual_line in actual_lines:
+        line_number += 1
+        if actual_line not in [b"00000", b""]:
+            return FileDifference(actual_path, line_number, b"00000", actual_line, list(context))
+        context.append(actual_line)
+    return None
+
+
+def compare_output_files(base_path, actual_path):
+    difference = find_first_difference(base_path, actual_path)
+    assert difference is None, str(difference)
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import random
+
+import numpy as np
+
+from Infra.output_cache import digest
+
+
+# Seed of the session, every test seed is derived from it and the test id. A random one is used
+# (and printed) when it is not set.
+SEED_ENVIRONMENT_VARIABLE = "SIMP_TEST_SEED"
+# The (test id, seed, disk seed, input digest) of every failing test is appended to this file
+REPLAY_LOG_ENVIRONMENT_VARIABLE = "SIMP_TEST_REPLAY_LOG"
+# Replay mode: only the tests of this log are executed, each with its logged seeds
+REPLAY_ENVIRONMENT_VARIABLE = "SIMP_TEST_REPLAY"
+
+# Seed of the random disk image that is shared by the tests of a session (the image is generated
+# once, see SimulatorTestRunner.generate_random_diskin_data), SeedManager.seed_test sets it
+_disk_seed = random.SystemRandom().getrandbits(32)
+
+# Input files of a test folder that are covered by the input digest
+INPUT_FILE_NAMES = ["test.asm", "diskin.txt", "irq2in.txt"]
+
+
+class SeedException(Exception):
+    pass
+
+
+def derive_seed(session_seed, test_id):
+    # 64 bits seed of a test, stable across runs, machines and test orders
+    h = hashlib.sha256(f"{session_seed}:{test_id}".encode()).digest()
+    return int.from_bytes(h[:8], "little")
+
+
+def disk_seed():
+    return _disk_seed
+
+
+def inputs_digest(test_folder):
+    # Hash of the input files of a test folder, files that do not exist are hashed as missing
+    parts = []
+    for file_name in INPUT_FILE_NAMES:
+        file_path = os.path.join(test_folder, file_name)
+        if os.path.isfile(file_path):
+            with open(file_path, "rb") as f:
+                parts += [file_name, f.read()]
+    return digest(*parts)[:16]
+
+
+# Append only log with one "test_id seed disk_seed digest" line (tab separated) per failing test. Every line
+# is written by a single O_APPEND write, so parallel workers can share one log file.
+class ReplayLog(object):
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def append(self, test_id, seed, disk_seed, input_digest):
+        if any(char in test_id for char in "\t\n"):
+            raise SeedException(f"Test id can not be logged: {test_id!r}")
+        line = f"{test_id}\t{seed:016x}\t{disk_seed:08x}\t{input_digest}\n".encode()
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line)
+        finally:
+            os.close(fd)
+
+    def read(self):
+        # {test id: (seed, disk seed, input digest)}, a later line of the same test replaces an earlier one
+        entries = {}
+        with open(self.file_path, "r") as f:
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                if len(fields) != 4:
+                    raise SeedException(f"{self.file_path}:{line_number}: expected 4 fields, got {len(fields)}")
+                test_id, seed, disk_seed, input_digest = fields
+                entries[test_id] = (int(seed, 16), int(disk_seed, 16), input_digest)
+        return entries
+
+
+class SeedManager(object):
+    def __init__(self, session_seed=None, replay_log=None, replay_entries=None):
+        self.session_seed = random.SystemRandom().getrandbits(32) if session_seed is None else session_seed
+        # One disk image for the whole session, so it is generated once
+        self.disk_seed = derive_seed(self.session_seed, "diskin") & 0xFFFFFFFF
+        self.replay_log = replay_log
+        # {test id: (seed, input digest)} in replay mode, None otherwise
+        self.replay_entries = replay_entries
+
+    @classmethod
+    def from_environment(cls):
+        session_seed = os.environ.get(SEED_ENVIRONMENT_VARIABLE)
+        replay_log_path = os.environ.get(REPLAY_LOG_ENVIRONMENT_VARIABLE)
+        replay_path = os.environ.get(REPLAY_ENVIRONMENT_VARIABLE)
+        return cls(int(session_seed, 0) if session_seed else None,
+                   ReplayLog(replay_log_path) if replay_log_path else None,
+                   ReplayLog(replay_path).read() if replay_path else None)
+
+    def is_replay(self):
+        return self.replay_entries is not None
+
+    def should_run(self, test_id):
+        return not self.is_replay() or test_id in self.replay_entries
+
+    def seed_for(self, test_id):
+        if self.is_replay() and test_id in self.replay_entries:
+            return self.replay_entries[test_id][0]
+        return derive_seed(self.session_seed, test_id)
+
+    def disk_seed_for(self, test_id):
+        if self.is_replay() and test_id in self.replay_entries:
+            return self.replay_entries[test_id][1]
+        return self.disk_seed
+
+    def seed_test(self, test_id):
+        # Seeds the global random modules (used by the test input generators) and the disk image,
+        # returns the seed
+        global _disk_seed
+        _disk_seed = self.disk_seed_for(test_id)
+        seed = self.seed_for(test_id)
+        random.seed(seed)
+        np.random.seed(seed & 0xFFFFFFFF)
+        return seed
+
+    def expected_digest(self, test_id):
+        if not self.is_replay() or test_id not in self.replay_entries:
+            return None
+        return self.replay_entries[test_id][2]
+
+    def record_failure(self, test_id, seed, input_digest):
+        if self.replay_log is not None:
+            self.replay_log.append(test_id, seed, self.disk_seed_for(test_id), input_digest)
@@ -0,0 +1,330 @@
+import os
+
+from Infra.assembler_wrapper import OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
+
+
+MEMORY_SIZE = 4096
+NUMBER_OF_REGISTERS = len(REGISTER_TO_NUMBER)
+SECTOR_SIZE = 128
+NUMBER_OF_SECTORS = 128
+DISK_SIZE = SECTOR_SIZE * NUMBER_OF_SECTORS
+DISK_LATENCY = 1024
+MONITOR_WIDTH = 256
+MONITOR_SIZE = MONITOR_WIDTH * MONITOR_WIDTH
+
+IO_REGISTERS = ["irq0enable", "irq1enable", "irq2enable", "irq0status", "irq1status", "irq2status",
+                "irqhandler", "irqreturn", "clks", "leds", "display7seg", "timerenable", "timercurrent",
+                "timermax", "diskcmd", "disksector", "diskbuffer", "diskstatus", "reserved", "reserved",
+                "monitoraddr", "monitordata", "monitorcmd"]
+IO_REGISTER_TO_NUMBER = {name: number for number, name in enumerate(IO_REGISTERS) if name != "reserved"}
+# Amount of bits that are kept when writing to an IO register
+IO_REGISTER_WIDTH = [1, 1, 1, 1, 1, 1, 12, 12, 32, 32, 32, 1, 32, 32, 2, 7, 12, 1, 32, 32, 16, 8, 1]
+
+DISK_CMD_NONE = 0
+DISK_CMD_READ = 1
+DISK_CMD_WRITE = 2
+
+_ZERO = REGISTER_TO_NUMBER["$zero"]
+_IMM = REGISTER_TO_NUMBER["$imm"]
+
+_ADD = OPCODE_TO_NUMBER["add"]
+_SUB = OPCODE_TO_NUMBER["sub"]
+_MUL = OPCODE_TO_NUMBER["mul"]
+_AND = OPCODE_TO_NUMBER["and"]
+_OR = OPCODE_TO_NUMBER["or"]
+_XOR = OPCODE_TO_NUMBER["xor"]
+_SLL = OPCODE_TO_NUMBER["sll"]
+_SRA = OPCODE_TO_NUMBER["sra"]
+_SRL = OPCODE_TO_NUMBER["srl"]
+_BEQ = OPCODE_TO_NUMBER["beq"]
+_BNE = OPCODE_TO_NUMBER["bne"]
+_BLT = OPCODE_TO_NUMBER["blt"]
+_BGT = OPCODE_TO_NUMBER["bgt"]
+_BLE = OPCODE_TO_NUMBER["ble"]
+_BGE = OPCODE_TO_NUMBER["bge"]
+_JAL = OPCODE_TO_NUMBER["jal"]
+_LW = OPCODE_TO_NUMBER["lw"]
+_SW = OPCODE_TO_NUMBER["sw"]
+_RETI = OPCODE_TO_NUMBER["reti"]
+_IN = OPCODE_TO_NUMBER["in"]
+_OUT = OPCODE_TO_NUMBER["out"]
+_HALT = OPCODE_TO_NUMBER["halt"]
+
+_BRANCH_CONDITIONS = {
+    _BEQ: lambda a, b: a == b,
+    _BNE: lambda a, b: a != b,
+    _BLT: lambda a, b: a < b,
+    _BGT: lambda a, b: a > b,
+    _BLE: lambda a, b: a <= b,
+    _BGE: lambda a, b: a >= b,
+}
+
+
+class SimulatorModelException(Exception):
+    pass
+
+
+def to_signed(value, bits=32):
+    value &= (1 << bits) - 1
+    if value >= 1 << (bits - 1):
+        value -= 1 << bits
+    return value
+
+
+def parse_hex_lines(data, size):
+    # Parses memin/diskin like data (one hex word per line), padding with zeros up to size
+    words = [int(line, 16) for line in data.split() if line]
+    if len(words) > size:
+        raise SimulatorModelException(f"Too many words: {len(words)} > {size}")
+    return words + [0] * (size - len(words))
+
+
+def parse_irq2in(data):
+    return sorted(int(line) for line in data.split() if line)
+
+
+def _strip_trailing_zeros(values):
+    last_index = len(values)
+    while last_index > 0 and values[last_index - 1] == 0:
+        last_index -= 1
+    return values[:last_index]
+
+
+# Reference model of the SIMP processor, executes memin images (for example, the output of
+# Assembler.run) and produces the same output files as the C simulator
+class SimulatorModel(object):
+    def __init__(self, memin="", diskin="", irq2in="", max_cycles=None):
+        self.memory = parse_hex_lines(memin, MEMORY_SIZE)
+        self.disk = parse_hex_lines(diskin, DISK_SIZE)
+        self.irq2_cycles = parse_irq2in(irq2in)
+        self.max_cycles = max_cycles
+
+        self.registers = [0] * NUMBER_OF_REGISTERS
+        self.io_registers = [0] * len(IO_REGISTERS)
+        self.monitor = bytearray(MONITOR_SIZE)
+        self.pc = 0
+        self.cycles = 0
+        self.in_irq = False
+        self.returned_from_irq = False
+        self.halted = False
+        self.disk_timer = 0
+        self._irq2_index = 0
+
+        self.trace = []
+        self.hwregtrace = []
+        self.leds = []
+        self.display7seg = []
+
+    @classmethod
+    def from_files(cls, memin_path, diskin_path=None, irq2in_path=None, max_cycles=None):
+        inputs = []
+        for path in [memin_path, diskin_path, irq2in_path]:
+            data = ""
+            if path is not None and os.path.exists(path):
+                with open(path, "r") as f:
+                    data = f.read()
+            inputs.append(data)
+        return cls(*inputs, max_cycles=max_cycles)
+
+    def _tick(self):
+        # Ends the current clock cycle, the hardware is updated at the end of every cycle
+        io_registers = self.io_registers
+        irq2_cycles = self.irq2_cycles
+        while self._irq2_index < len(irq2_cycles) and irq2_cycles[self._irq2_index] <= self.cycles:
+            if irq2_cycles[self._irq2_index] == self.cycles:
+                io_registers[5] = 1
+            self._irq2_index += 1
+
+        self.cycles += 1
+        io_registers[8] = (io_registers[8] + 1) & 0xFFFFFFFF
+
+        if io_registers[11]:
+            if io_registers[12] == io_registers[13]:
+                io_registers[3] = 1
+                io_registers[12] = 0
+            else:
+                io_registers[12] = (io_registers[12] + 1) & 0xFFFFFFFF
+
+        if self.disk_timer:
+            self.disk_timer -= 1
+            if self.disk_timer == 0:
+                io_registers[14] = DISK_CMD_NONE
+                io_registers[17] = 0
+                io_registers[4] = 1
+
+    def _irq(self):
+        io_registers = self.io_registers
+        return (io_registers[0] and io_registers[3]) or \
+               (io_registers[1] and io_registers[4]) or \
+               (io_registers[2] and io_registers[5])
+
+    def _start_disk_command(self, cmd):
+        io_registers = self.io_registers
+        if io_registers[17] or cmd not in [DISK_CMD_READ, DISK_CMD_WRITE]:
+            return
+        sector_start = io_registers[15] * SECTOR_SIZE
+        buffer_start = io_registers[16]
+        for i in range(SECTOR_SIZE):
+            address = (buffer_start + i) % MEMORY_SIZE
+            if cmd == DISK_CMD_READ:
+                self.memory[address] = self.disk[sector_start + i]
+            else:
+                self.disk[sector_start + i] = self.memory[address]
+        io_registers[17] = 1
+        self.disk_timer = DISK_LATENCY
+
+    def _io_read(self, address):
+        if address < 0 or address >= len(IO_REGISTERS):
+            return 0
+        value = self.io_registers[address]
+        # monitorcmd is write only
+        if address == 22:
+            value = 0
+        self.hwregtrace.append(f"{self.cycles} READ {IO_REGISTERS[address]} {value & 0xFFFFFFFF:08X}")
+        return value
+
+    def _io_write(self, address, value):
+        if address < 0 or address >= len(IO_REGISTERS):
+            return
+        value &= (1 << IO_REGISTER_WIDTH[address]) - 1
+        self.hwregtrace.append(f"{self.cycles} WRITE {IO_REGISTERS[address]} {value:08X}")
+        self.io_registers[address] = value
+
+        if address == 9:
+            self.leds.append(f"{self.cycles} {value:08X}")
+        elif address == 10:
+            self.display7seg.append(f"{self.cycles} {value:08X}")
+        elif address == 14:
+            self._start_disk_command(value)
+        elif address == 22 and value == 1:
+            self.monitor[self.io_registers[20] % MONITOR_SIZE] = self.io_registers[21]
+
+    def step(self):
+        if self.halted:
+            return
+        if self.returned_from_irq:
+            # The instruction at irqreturn is always executed before the next interrupt is taken
+            self.returned_from_irq = False
+        elif not self.in_irq and self._irq():
+            self.in_irq = True
+            self.io_registers[7] = self.pc
+            self.pc = self.io_registers[6]
+
+        registers = self.registers
+        memory = self.memory
+        pc = self.pc
+        instruction = memory[pc]
+        opcode = instruction >> 12
+        rd = (instruction >> 8) & 0xF
+        rs = (instruction >> 4) & 0xF
+        rt = instruction & 0xF
+
+        is_i_format = _IMM in (rd, rs, rt)
+        if is_i_format:
+            registers[_IMM] = to_signed(memory[(pc + 1) % MEMORY_SIZE], 20)
+            next_pc = (pc + 2) % MEMORY_SIZE
+        else:
+            registers[_IMM] = 0
+            next_pc = (pc + 1) % MEMORY_SIZE
+
+        self.trace.append(f"{pc:03X} {instruction:05X} " + " ".join(f"{r & 0xFFFFFFFF:08X}" for r in registers))
+
+        # The immediate is fetched on its own clock cycle
+        if is_i_format:
+            self._tick()
+
+        a = registers[rs]
+        b = registers[rt]
+        result = None
+        if opcode == _ADD:
+            result = a + b
+        elif opcode == _SUB:
+            result = a - b
+        elif opcode == _MUL:
+            result = a * b
+        elif opcode == _AND:
+            result = a & b
+        elif opcode == _OR:
+            result = a | b
+        elif opcode == _XOR:
+            result = a ^ b
+        elif opcode == _SLL:
+            result = a << (b & 0x1F)
+        elif opcode == _SRA:
+            result = a >> (b & 0x1F)
+        elif opcode == _SRL:
+            result = (a & 0xFFFFFFFF) >> (b & 0x1F)
+        elif opcode in _BRANCH_CONDITIONS:
+            if _BRANCH_CONDITIONS[opcode](a, b):
+                next_pc = registers[rd] & 0xFFF
+        elif opcode == _JAL:
+            result = next_pc
+            next_pc = a & 0xFFF
+        elif opcode == _LW:
+            result = to_signed(memory[(a + b) % MEMORY_SIZE], 20)
+            # Memory access takes an extra clock cycle
+            self._tick()
+        elif opcode == _SW:
+            memory[(a + b) % MEMORY_SIZE] = registers[rd] & 0xFFFFF
+            self._tick()
+        elif opcode == _RETI:
+            next_pc = self.io_registers[7]
+            self.in_irq = False
+            self.returned_from_irq = True
+        elif opcode == _IN:
+            result = self._io_read(a + b)
+        elif opcode == _OUT:
+            self._io_write(a + b, registers[rd])
+        elif opcode == _HALT:
+            self.halted = True
+        else:
+            raise SimulatorModelException(f"Invalid opcode {opcode} at address {pc}")
+
+        if result is not None and rd not in (_ZERO, _IMM):
+            registers[rd] = to_signed(result)
+
+        self.pc = next_pc
+        self._tick()
+
+    def run(self):
+        while not self.halted:
+            if self.max_cycles is not None and self.cycles >= self.max_cycles:
+                raise SimulatorModelException(f"Program did not halt after {self.cycles} cycles")
+            self.step()
+        return self
+
+    def get_register(self, reg):
+        return self.registers[REGISTER_TO_NUMBER[reg]]
+
+    def memout(self):
+        return "".join(f"{word:05X}\n" for word in _strip_trailing_zeros(self.memory))
+
+    def regout(self):
+        return "".join(f"{reg & 0xFFFFFFFF:08X}\n" for reg in self.registers[2:])
+
+    def diskout(self):
+        return "".join(f"{word:05X}\n" for word in _strip_trailing_zeros(self.disk))
+
+    def monitor_txt(self):
+        return "".join(f"{pixel:02X}\n" for pixel in _strip_trailing_zeros(self.monitor))
+
+    def outputs(self):
+        # Output file name to its content, same as the files written by the C simulator
+        return {
+            "memout.txt": self.memout(),
+            "regout.txt": self.regout(),
+            "trace.txt": "".join(f"{line}\n" for line in self.trace),
+            "hwregtrace.txt": "".join(f"{line}\n" for line in self.hwregtrace),
+            "cycles.txt": f"{self.cycles}\n",
+            "leds.txt": "".join(f"{line}\n" for line in self.leds),
+            "display7seg.txt": "".join(f"{line}\n" for line in self.display7seg),
+            "diskout.txt": self.diskout(),
+            "monitor.txt": self.monitor_txt(),
+        }
+
+    def write_outputs(self, folder):
+        for file_name, data in self.outputs().items():
+            with open(os.path.join(folder, file_name), "w") as f:
+                f.write(data)
+        with open(os.path.join(folder, "monitor.yuv"), "wb") as f:
+            f.write(self.monitor)
@@ -0,0 +1,145 @@
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from Infra.assembler_wrapper import AssemblerException
+from Infra.executor import ExecutionException
+from Infra.simulator_wrapper import PersistentSimulatorRunner, SimulatorException
+from Infra.timing import recorder
+
+
+class SimulatorJob(object):
+    def __init__(self, asm_input, diskin="", irq2in="", regs_to_validate=None, files_to_read=None):
+        self.asm_input = asm_input
+        self.diskin = diskin
+        self.irq2in = irq2in
+        self.regs_to_validate = regs_to_validate
+        # Output files (for example "memout.txt") to send back with the result
+        self.files_to_read = files_to_read or []
+
+
+class SimulatorResult(object):
+    def __init__(self, job_index, regs=None, files=None, error=None):
+        self.job_index = job_index
+        self.regs = regs or {}
+        self.files = files or {}
+        self.error = error
+        self.mismatches = {}
+        # PhaseStats of the job, merged into the timing recorder of the parent process
+        self.phase_stats = []
+
+    def validate_regs(self, regs_to_validate):
+        for reg, expected_value in (regs_to_validate or {}).items():
+            actual_value = self.regs.get(reg)
+            if actual_value != expected_value:
+                self.mismatches[reg] = (expected_value, actual_value)
+
+    def passed(self):
+        return self.error is None and not self.mismatches
+
+    def __str__(self):
+        if self.error is not None:
+            return f"Job {self.job_index}: {self.error}"
+        mismatches = ", ".join(f"{reg} expected: {expected}, actual: {actual}"
+                               for reg, (expected, actual) in self.mismatches.items())
+        return f"Job {self.job_index}: {mismatches}"
+
+
+# Every worker process keeps a single runner on its own scratch folder for all of its jobs
+_worker_runner = None
+
+
+def _init_worker(assembler_path, simulator_path, scratch_folder, executor):
+    global _worker_runner
+    # Forked workers start with a copy of the stats of the parent
+    recorder.reset()
+    worker_folder = tempfile.mkdtemp(prefix=f"worker_{os.getpid()}_", dir=scratch_folder)
+    _worker_runner = PersistentSimulatorRunner(assembler_path, simulator_path, worker_folder, executor=executor)
+
+
+def _run_job(job_index, job):
+    result = _run_worker_job(job_index, job)
+    result.phase_stats = recorder.take_stats()
+    return result
+
+
+def _run_worker_job(job_index, job):
+    runner = _worker_runner
+    try:
+        # Truncates the files of the previous job in the worker scratch folder
+        runner.run_program(job.asm_input, job.diskin, job.irq2in)
+        regs = runner.read_regout()
+    except (AssemblerException, SimulatorException, ExecutionException) as e:
+        return SimulatorResult(job_index, error=str(e))
+    except AssertionError as e:
+        # cycles.txt does not match the cycle model
+        return SimulatorResult(job_index, error=str(e))
+
+    files = {}
+    for file_name in job.files_to_read:
+        with open(os.path.join(runner.test_folder, file_name), "rb") as f:
+            files[file_name] = f.read()
+
+    result = SimulatorResult(job_index, regs=regs, files=files)
+    result.validate_regs(job.regs_to_validate)
+    return result
+
+
+class SimulatorPool(object):
+    def __init__(self, assembler_path, simulator_path, scratch_folder, workers=None, executor=None):
+        self.assembler_path = assembler_path
+        self.simulator_path = simulator_path
+        self.scratch_folder = scratch_folder
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.jobs = []
+        self._process_pool = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def start(self):
+        if self._process_pool is None:
+            os.makedirs(self.scratch_folder, exist_ok=True)
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.assembler_path, self.simulator_path, self.scratch_folder, self.executor))
+
+    def close(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown()
+            self._process_pool = None
+
+    def submit(self, job):
+        self.jobs.append(job)
+        return len(self.jobs) - 1
+
+    def run(self):
+        # Returns the results of all queued jobs, ordered like the jobs were submitted
+        jobs, self.jobs = self.jobs, []
+        if not jobs:
+            return []
+
+        should_close = self._process_pool is None
+        self.start()
+        try:
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+            results = list(self._process_pool.map(_run_job, range(len(jobs)), jobs, chunksize=chunksize))
+        finally:
+            if should_close:
+                self.close()
+        for result in results:
+            recorder.merge(result.phase_stats)
+        return results
+
+    def run_and_validate(self):
+        results = self.run()
+        failed_results = [result for result in results if not result.passed()]
+        assert not failed_results, f"{len(failed_results)}/{len(results)} jobs failed, first failures:{os.linesep}" + \
+            os.linesep.join(str(result) for result in failed_results[:10])
+        return results
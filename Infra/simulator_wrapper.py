@@ -1,18 +1,45 @@
 import os
-import random
 from pathlib import Path
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
+from Infra import seeds
 from Infra.assembler_wrapper import REGISTER_TO_NUMBER, AssemblerTestRunner
+from Infra.cycle_model import VALIDATE_CYCLES_ENVIRONMENT_VARIABLE, find_cycle_difference, io_timing_differences, read_cycles
+from Infra.disk_image import DiskImage, parse_hex_words
+from Infra.executor import BinaryExecutor
+from Infra.hwregtrace import HwRegTrace
+from Infra.monitor import MonitorFrame
+from Infra.output_files import HexWordsFile, TraceFile, compare_output_files, find_first_difference
+from Infra.output_cache import OutputCache, binary_digest, digest
+from Infra.simulator_model import DISK_SIZE, MEMORY_SIZE, SimulatorModel
+from Infra.timing import phase
+from Infra.trace_table import TraceTable, find_first_trace_difference
 
 
 class SimulatorException(Exception):
     pass
 
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
 class SimulatorTestRunner(object):
-    def __init__(self, assembler_path, simulator_path, test_folder, should_compile=False):
-        self.assembler_runner = AssemblerTestRunner(assembler_path, test_folder, should_compile=should_compile)
+    def __init__(self, assembler_path, simulator_path, test_folder, should_compile=False, executor=None,
+                 assembler_cache=None, simulator_cache=None):
+        self.executor = executor or BinaryExecutor()
+        # On an assembler cache hit the cached memin.txt is used and the C assembler is not executed
+        self.assembler_runner = AssemblerTestRunner(assembler_path, test_folder, should_compile=should_compile,
+                                                    executor=self.executor, cache=assembler_cache)
         self.c_simulator_path = os.path.realpath(simulator_path)
+        # All output files by memin, diskin, irq2in and simulator binary, see Infra/output_cache.py
+        self.simulator_cache = simulator_cache if simulator_cache is not None else OutputCache.from_environment()
+        self.last_execution = None
         self.input_data = None
         self.expected_output = None
         self.test_folder = test_folder
@@ -29,6 +56,17 @@ class SimulatorTestRunner(object):
         self.display7seg_txt_path = os.path.join(self.test_folder, "display7seg.txt")
         self.diskout_txt_path = os.path.join(self.test_folder, "diskout.txt")
         self.monitor_txt_path = os.path.join(self.test_folder, "monitor.txt")
+        self.monitor_diff_png_path = os.path.join(self.test_folder, "monitor_diff.png")
+        self.input_paths = [self.memin_txt_path, self.diskin_txt_path, self.irq2in_txt_path]
+        self.output_paths = [self.memout_txt_path, self.regout_txt_path, self.trace_txt_path,
+                             self.hwregtrace_txt_path, self.cycles_txt_path, self.leds_txt_path,
+                             self.display7seg_txt_path, self.diskout_txt_path, self.monitor_txt_path]
+        # Simulator cache hits are hardlinked, otherwise they are copied into the existing output files
+        self.link_cached_outputs = True
+        # (file stat, HwRegTrace) of the last parsed hwregtrace.txt
+        self._hwregtrace = None
+        # Runs check cycles.txt against the cycle model (see Infra/cycle_model.py) only when enabled
+        self.validate_cycles = os.environ.get(VALIDATE_CYCLES_ENVIRONMENT_VARIABLE) == "1"
 
     def set_input_data_from_str(self, input_data):
         self.assembler_runner.set_input_data_from_str(input_data)
@@ -40,38 +78,73 @@ class SimulatorTestRunner(object):
         with open(self.diskin_txt_path, "wb") as f:
             f.write(input_diskin.encode())
 
-    def generate_random_diskin_data(self, disk_size=128*128):
-        rnd_numbers = [random.randint(0, 2**20) for x in range(disk_size)]
-        diskin_list = [f"%05x"%(x) for x in rnd_numbers]
-        diskin_data = os.linesep.join(diskin_list)
-        self.set_diskin(diskin_data)
-        return [x.encode() for x in diskin_list]
+    def set_irq2in(self, input_irq2in):
+        with open(self.irq2in_txt_path, "wb") as f:
+            f.write(input_irq2in.encode())
+
+    def set_diskin_image(self, disk_image):
+        disk_image.write(self.diskin_txt_path)
+
+    def generate_random_diskin_data(self, disk_size=DISK_SIZE, seed=None):
+        # Without a seed the disk image of the session is used (see Infra/seeds.py), it is generated once
+        disk_image = DiskImage.random(seeds.disk_seed() if seed is None else seed, disk_size)
+        self.set_diskin_image(disk_image)
+        return disk_image
 
     def run(self, regs_to_validate=None):
-        c_assembler_output = self.assembler_runner.execute_c_assembler(
-            self.test_asm_path,
-            self.memin_txt_path)
+        with phase("simulator.run"):
+            c_assembler_output = self.assembler_runner.execute_c_assembler(
+                self.test_asm_path,
+                self.memin_txt_path)
+
+            self.execute_c_simulator()
+            self._validate_cycles()
+            self._validate_regs(regs_to_validate)
+
+    def _validate_cycles(self):
+        if not self.validate_cycles:
+            return
 
-        self.execute_c_simulator()
-        self._validate_regs(regs_to_validate)
+        with phase("simulator.validate_cycles"):
+            cycle_difference = find_cycle_difference(read_cycles(self.cycles_txt_path), self.read_trace_table(),
+                                                     self.assembler_runner.input_data)
+        assert cycle_difference is None, str(cycle_difference)
+
+    def validate_io_timing(self):
+        # Reads of clks, timercurrent and diskstatus against the cycle counter, timer and disk latency
+        differences = io_timing_differences(self.read_hwregtrace_table())
+        assert not differences, os.linesep.join(differences)
 
     def _validate_regs(self, regs_to_validate):
         if regs_to_validate is None:
             return
 
+        with phase("simulator.validate_regs") as record:
+            register_values = self.read_regout()
+            record.read(_file_size(self.regout_txt_path))
+
+            for reg, expected_value in regs_to_validate.items():
+                reg_index = REGISTER_TO_NUMBER[reg]
+                if reg_index == 0 or reg_index == 1:
+                    raise SimulatorException("Cannot validate registers $zero or $imm because they are not saved at reg.txt")
+                int_actual_reg_value = register_values[reg]
+                print(f"Validating register {reg}. expected: {expected_value}, actual: {int_actual_reg_value}")
+                assert int_actual_reg_value == expected_value
+
+    def read_regout(self):
         with open(self.regout_txt_path, "rb") as f:
             register_values = f.read().splitlines()
 
-        for reg, expected_value in regs_to_validate.items():
-            reg_index = REGISTER_TO_NUMBER[reg]
-            if reg_index == 0 or reg_index == 1:
-                raise SimulatorException("Cannot validate registers $zero or $imm because they are not saved at reg.txt")
-            actual_reg_value = register_values[reg_index-2]
-            print(f"Validating register {reg}. expected: {expected_value}, actual: {actual_reg_value}")
-            int_actual_reg_value = int(actual_reg_value, 16)
-            if int_actual_reg_value >= 2**31:
-                int_actual_reg_value -= 2**32
-            assert int_actual_reg_value == expected_value
+        # regout.txt holds registers $v0 to $ra as signed 32 bits values
+        regs = {}
+        for reg, reg_index in REGISTER_TO_NUMBER.items():
+            if reg_index < 2:
+                continue
+            int_reg_value = int(register_values[reg_index-2], 16)
+            if int_reg_value >= 2**31:
+                int_reg_value -= 2**32
+            regs[reg] = int_reg_value
+        return regs
 
     def validate_all_regs_zero(self):
         self._validate_regs({key : 0 for key, value in REGISTER_TO_NUMBER.items() if value >=2})
@@ -91,6 +164,17 @@ class SimulatorTestRunner(object):
             memout = f.read().splitlines()
         return memout
 
+    def read_diskout_image(self):
+        return DiskImage.from_file(self.diskout_txt_path)
+
+    def read_memout_words(self):
+        with open(self.memout_txt_path, "rb") as f:
+            return parse_hex_words(f.read(), MEMORY_SIZE)
+
+    def read_memin_words(self):
+        with open(self.memin_txt_path, "rb") as f:
+            return parse_hex_words(f.read(), MEMORY_SIZE)
+
     def read_leds(self):
         with open(self.leds_txt_path, "rb") as f:
             leds = f.read().splitlines()
@@ -101,16 +185,55 @@ class SimulatorTestRunner(object):
             display7seg = f.read().splitlines()
         return [x.decode().split()[1] for x in display7seg]
 
+    def read_hwregtrace_table(self):
+        # Parsed once per simulator run and shared by the hwregtrace helpers
+        stat = os.stat(self.hwregtrace_txt_path)
+        stat_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if self._hwregtrace is None or self._hwregtrace[0] != stat_key:
+            self._hwregtrace = (stat_key, HwRegTrace.from_file(self.hwregtrace_txt_path))
+        return self._hwregtrace[1]
+
     def read_hwregtrace(self):
-        with open(self.hwregtrace_txt_path, "rb") as f:
-            hwregtrace = f.read().splitlines()
-        return {x.decode().split()[0]:x.decode().split()[2] for x in hwregtrace}
+        # {cycle: register name}, for every cycle with an IO register access
+        hwregtrace = self.read_hwregtrace_table()
+        return {str(cycle): hwregtrace.register_name(row) for row, cycle in enumerate(hwregtrace.cycle)}
+
+    def read_io_writes(self, register, start_cycle=0, end_cycle=None):
+        # (cycles, values) of the writes to an IO register in cycles [start_cycle, end_cycle)
+        return self.read_hwregtrace_table().writes(register, start_cycle, end_cycle)
 
     def read_trace(self):
         with open(self.trace_txt_path, "rb") as f:
             trace = f.read().splitlines()
         return trace
 
+    # Memory mapped readers, for large outputs that should not be loaded as a whole. Should be closed
+    # (or used with a with statement) before the next run.
+    def open_trace(self):
+        return TraceFile(self.trace_txt_path)
+
+    def open_memout(self):
+        return HexWordsFile(self.memout_txt_path)
+
+    def open_diskout(self):
+        return HexWordsFile(self.diskout_txt_path)
+
+    def read_monitor(self):
+        return MonitorFrame.from_txt(self.monitor_txt_path)
+
+    def read_trace_table(self):
+        return TraceTable.from_file(self.trace_txt_path)
+
+    def diff_trace(self, reference_directory=None, max_cycles=10**7):
+        # Returns the first difference (or None) between trace.txt and the trace of reference_directory,
+        # or of the python reference model when no directory is given
+        if reference_directory is None:
+            reference_directory = os.path.join(self.test_folder, "reference")
+            os.makedirs(reference_directory, exist_ok=True)
+            SimulatorModel.from_files(self.memin_txt_path, self.diskin_txt_path, self.irq2in_txt_path,
+                                      max_cycles=max_cycles).run().write_outputs(reference_directory)
+        return find_first_trace_difference(os.path.join(reference_directory, "trace.txt"), self.trace_txt_path)
+
     def copy_irq2_to_test_folder(self, original_path):
         shutil.copyfile(original_path, self.irq2in_txt_path)
 
@@ -121,39 +244,137 @@ class SimulatorTestRunner(object):
         Path(self.irq2in_txt_path).touch()
         Path(self.diskin_txt_path).touch()
 
-        cmd_args = [self.memin_txt_path, self.diskin_txt_path, self.irq2in_txt_path,
-                    self.memout_txt_path, self.regout_txt_path, self.trace_txt_path,
-                    self.hwregtrace_txt_path, self.cycles_txt_path, self.leds_txt_path,
-                    self.display7seg_txt_path, self.diskout_txt_path, self.monitor_txt_path]
-        command = ["cd", self.test_folder, "&&", self.c_simulator_path] + cmd_args
-        # TODO: change this to use Popen instead of os.system
-        result = os.system(" ".join(command))
-        if result != 0:
-            raise SimulatorException(f"C simulator failed")
+        output_file_names = [os.path.basename(path) for path in self.output_paths]
+        with phase("simulator.execute") as record:
+            cache_key = self._simulator_cache_key(self.input_paths) if self.simulator_cache is not None else None
+            if cache_key is not None and self.simulator_cache.get(cache_key, output_file_names, self.test_folder,
+                                                                  link=self.link_cached_outputs):
+                self.last_execution = None
+                record.cache_hit = True
+            else:
+                if self.link_cached_outputs:
+                    # Outputs may be hardlinks into the cache from a previous hit, the simulator must create new files
+                    for path in self.output_paths:
+                        try:
+                            os.unlink(path)
+                        except FileNotFoundError:
+                            pass
+                result = self.executor.run([self.c_simulator_path] + self.input_paths + self.output_paths,
+                                           cwd=self.test_folder)
+                self.last_execution = result
+                record.add_execution(result)
+                if not result.succeeded():
+                    raise SimulatorException(f"C simulator failed: {result}")
+                if cache_key is not None:
+                    self.simulator_cache.put(cache_key, self.test_folder, output_file_names)
+                # Bytes of the inputs and outputs of the simulator
+                record.read(sum(_file_size(path) for path in self.input_paths))
+                record.wrote(sum(_file_size(path) for path in self.output_paths))
 
         # Return output from memout
-        with open(self.memout_txt_path, "r") as f:
-            memout_data =  f.read()
+        with phase("simulator.read_memout") as record:
+            with open(self.memout_txt_path, "r") as f:
+                memout_data =  f.read()
+            record.read(len(memout_data))
         return memout_data
 
-    def _compare_files(self, file1_path, file2_path):
-        with open(file1_path, "rb") as f1:
-                d1 = f1.read().decode().replace("\r", "")
-        with open(file2_path, "rb") as f2:
-                d2 = f2.read().decode().replace("\r", "")
-
-        min_length = min(len(d1), len(d2))
-        assert d1[:min_length] == d2[:min_length]
+    def _simulator_cache_key(self, input_paths):
+        input_data = []
+        for path in input_paths:
+            with open(path, "rb") as f:
+                input_data.append(f.read())
+        return digest(*input_data, binary_digest(self.c_simulator_path))
 
-        # Validate left over lines are only zeros
-        assert all([x in ["00000", ""] for x in d2[min_length:].split("\n")])
+    def _compare_files(self, file1_path, file2_path):
+        compare_output_files(file1_path, file2_path)
 
     def compare_directories(self, base_directory):
         files_to_compare = ["cycles.txt", "diskin.txt", "diskout.txt", "display7seg.txt", "hwregtrace.txt",
                             "irq2in.txt", "memin.txt", "memout.txt", "regout.txt", "trace.txt"]
-        for file_to_compare in files_to_compare:
-            base_path = os.path.join(base_directory, file_to_compare)
-            simulator_path = os.path.join(self.test_folder, file_to_compare)
-            self._compare_files(base_path, simulator_path)
-
-
+        with phase("simulator.compare_directories") as record:
+            # Files are compared concurrently, each one is streamed and stops at its first difference
+            with ThreadPoolExecutor(max_workers=len(files_to_compare)) as executor:
+                differences = list(executor.map(
+                    lambda file_name: find_first_difference(os.path.join(base_directory, file_name),
+                                                            os.path.join(self.test_folder, file_name)),
+                    files_to_compare))
+            differences = [str(difference) for difference in differences if difference is not None]
+
+            monitor_difference = self._compare_monitor(base_directory)
+            if monitor_difference:
+                differences.append(str(monitor_difference))
+            # Sizes of the compared files, comparisons stop earlier at a difference
+            record.read(sum(_file_size(os.path.join(folder, file_name))
+                            for folder in [base_directory, self.test_folder] for file_name in files_to_compare))
+        assert not differences, (os.linesep * 2).join(differences)
+
+    def _compare_monitor(self, base_directory):
+        # Compares the frames pixel by pixel, the reference frame is read from monitor.yuv when it exists
+        base_path = os.path.join(base_directory, "monitor.yuv")
+        if not os.path.exists(base_path):
+            base_path = os.path.join(base_directory, "monitor.txt")
+            if not os.path.exists(base_path):
+                return None
+        reference_frame = MonitorFrame.from_file(base_path)
+        frame = self.read_monitor()
+        monitor_difference = frame.diff(reference_frame)
+        if monitor_difference:
+            frame.write_diff_png(reference_frame, self.monitor_diff_png_path)
+        return monitor_difference
+
+
+TMPFS_FOLDER = "/dev/shm"
+
+
+# Long lived runner for many consecutive simulations. The scratch folder and all of the input and
+# output files are created once, and reset() truncates them between runs, so every run reuses
+# the same directory entries and inodes instead of creating new ones.
+class PersistentSimulatorRunner(SimulatorTestRunner):
+    def __init__(self, assembler_path, simulator_path, scratch_folder=None, use_tmpfs=False, executor=None,
+                 assembler_cache=None, simulator_cache=None):
+        # A scratch folder is created (on tmpfs when use_tmpfs is set and available) and removed by
+        # close() when no folder is given
+        self._owns_scratch_folder = scratch_folder is None
+        if scratch_folder is None:
+            base_folder = TMPFS_FOLDER if use_tmpfs and os.path.isdir(TMPFS_FOLDER) else None
+            scratch_folder = tempfile.mkdtemp(prefix="simulator_", dir=base_folder)
+        else:
+            os.makedirs(scratch_folder, exist_ok=True)
+        super(PersistentSimulatorRunner, self).__init__(assembler_path, simulator_path, scratch_folder,
+                                                        executor=executor, assembler_cache=assembler_cache,
+                                                        simulator_cache=simulator_cache)
+        # Hardlinked cache hits would replace the preallocated files
+        self.link_cached_outputs = False
+        self.scratch_paths = [self.test_asm_path] + self.input_paths + self.output_paths
+        for path in self.scratch_paths:
+            open(path, "ab").close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def reset(self):
+        # Empties all of the inputs and outputs of the previous run
+        for path in self.scratch_paths:
+            try:
+                os.truncate(path, 0)
+            except FileNotFoundError:
+                open(path, "ab").close()
+        self.last_execution = None
+        self.assembler_runner.last_execution = None
+        self._hwregtrace = None
+
+    def run_program(self, asm_input, diskin="", irq2in="", regs_to_validate=None):
+        self.reset()
+        self.set_input_data_from_str(asm_input)
+        if diskin:
+            self.set_diskin(diskin)
+        if irq2in:
+            self.set_irq2in(irq2in)
+        self.run(regs_to_validate)
+
+    def close(self):
+        if self._owns_scratch_folder and os.path.isdir(self.test_folder):
+            shutil.rmtree(self.test_folder, ignore_errors=True)
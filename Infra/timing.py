@@ -0,0 +1,156 @@
+import csv
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Setting this environment variable writes the timing report of the session to the file
+# (CSV when it ends with .csv, JSON otherwise), see tests/conftest.py
+REPORT_ENVIRONMENT_VARIABLE = "SIMP_TEST_TIMING_REPORT"
+
+
+class PhaseRecord(object):
+    # Measurements of a single execution of a phase
+    def __init__(self, name):
+        self.name = name
+        self.elapsed_time = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.cache_hit = False
+        self.executions = []
+
+    def read(self, number_of_bytes):
+        self.bytes_read += number_of_bytes
+
+    def wrote(self, number_of_bytes):
+        self.bytes_written += number_of_bytes
+
+    def add_execution(self, execution_result):
+        self.executions.append(execution_result)
+
+
+class PhaseStats(object):
+    FIELDS = ["phase", "calls", "total_time", "mean_time", "max_time", "bytes_read", "bytes_written", "cache_hits",
+              "executions", "spawn_time", "child_user_time", "child_system_time", "child_max_rss"]
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self.cache_hits = 0
+        self.executions = 0
+        self.spawn_time = 0.0
+        self.child_user_time = 0.0
+        self.child_system_time = 0.0
+        self.child_max_rss = 0
+
+    def add(self, record):
+        self.calls += 1
+        self.total_time += record.elapsed_time
+        self.max_time = max(self.max_time, record.elapsed_time)
+        self.bytes_read += record.bytes_read
+        self.bytes_written += record.bytes_written
+        self.cache_hits += record.cache_hit
+        for result in record.executions:
+            self.executions += 1
+            self.spawn_time += result.spawn_time or 0.0
+            self.child_user_time += result.user_time or 0.0
+            self.child_system_time += result.system_time or 0.0
+            self.child_max_rss = max(self.child_max_rss, result.max_rss or 0)
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        self.cache_hits += other.cache_hits
+        self.executions += other.executions
+        self.spawn_time += other.spawn_time
+        self.child_user_time += other.child_user_time
+        self.child_system_time += other.child_system_time
+        self.child_max_rss = max(self.child_max_rss, other.child_max_rss)
+
+    def to_dict(self):
+        return {"phase": self.name, "calls": self.calls, "total_time": self.total_time,
+                "mean_time": self.total_time / self.calls if self.calls else 0.0, "max_time": self.max_time,
+                "bytes_read": self.bytes_read, "bytes_written": self.bytes_written, "cache_hits": self.cache_hits,
+                "executions": self.executions, "spawn_time": self.spawn_time,
+                "child_user_time": self.child_user_time, "child_system_time": self.child_system_time,
+                "child_max_rss": self.child_max_rss}
+
+
+# Aggregates the phase records of the process. Phases nest (simulator.run includes
+# assembler.execute and simulator.execute), so the times of a phase include its sub phases.
+# Worker processes (see Infra/simulator_pool.py) record into recorders of their own, their stats
+# are sent with every job result and merged into the recorder of the parent, so the phase times of
+# parallel jobs add up to more than the wall time.
+class TimingRecorder(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {}
+        self.start_time = time.monotonic()
+
+    @contextmanager
+    def phase(self, name):
+        record = PhaseRecord(name)
+        start_time = time.monotonic()
+        try:
+            yield record
+        finally:
+            record.elapsed_time = time.monotonic() - start_time
+            with self._lock:
+                if name not in self.stats:
+                    self.stats[name] = PhaseStats(name)
+                self.stats[name].add(record)
+
+    def take_stats(self):
+        # Returns the PhaseStats recorded so far and starts over, used by worker processes
+        with self._lock:
+            stats, self.stats = self.stats, {}
+        return list(stats.values())
+
+    def merge(self, stats):
+        with self._lock:
+            for phase_stats in stats:
+                if phase_stats.name not in self.stats:
+                    self.stats[phase_stats.name] = PhaseStats(phase_stats.name)
+                self.stats[phase_stats.name].merge(phase_stats)
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}
+            self.start_time = time.monotonic()
+
+    def report(self):
+        with self._lock:
+            phases = [self.stats[name].to_dict() for name in sorted(self.stats)]
+        return {"wall_time": time.monotonic() - self.start_time, "pid": os.getpid(), "phases": phases}
+
+    def write_json(self, file_path):
+        with open(file_path, "w") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_csv(self, file_path):
+        with open(file_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=PhaseStats.FIELDS)
+            writer.writeheader()
+            writer.writerows(self.report()["phases"])
+
+    def write(self, file_path):
+        if os.path.splitext(file_path)[1].lower() == ".csv":
+            self.write_csv(file_path)
+        else:
+            self.write_json(file_path)
+
+
+recorder = TimingRecorder()
+
+
+def phase(name):
+    return recorder.phase(name)
@@ -0,0 +1,226 @@
+import os
+
+import numpy as np
+
+from Infra.assembler_wrapper import OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
+from Infra.disk_image import parse_hex_columns
+from Infra.output_files import TraceFile
+from Infra.simulator_model import NUMBER_OF_REGISTERS
+
+
+class TraceTableException(Exception):
+    pass
+
+
+_IMM = REGISTER_TO_NUMBER["$imm"]
+_MEMORY_OPCODES = [OPCODE_TO_NUMBER["lw"], OPCODE_TO_NUMBER["sw"]]
+
+# Fixed layout of a trace line: "PPP IIIII R0 ... R15" with 8 hex digits per register
+_PC_COLUMNS = slice(0, 3)
+_INSTRUCTION_COLUMNS = slice(4, 9)
+_REGISTERS_START = 10
+_REGISTER_DIGITS = 8
+TRACE_LINE_WIDTH = _REGISTERS_START + NUMBER_OF_REGISTERS * (_REGISTER_DIGITS + 1) - 1
+
+
+def _register_index(reg):
+    return REGISTER_TO_NUMBER[reg] if isinstance(reg, str) else reg
+
+
+def instruction_cycles(instruction):
+    # Cycles of every instruction: 1, one more for the immediate of I-format commands and one more
+    # for the memory access of lw/sw
+    instruction = np.asarray(instruction, dtype=np.uint32)
+    rd = (instruction >> 8) & 0xF
+    rs = (instruction >> 4) & 0xF
+    rt = instruction & 0xF
+    is_i_format = (rd == _IMM) | (rs == _IMM) | (rt == _IMM)
+    is_memory = np.isin(instruction >> 12, _MEMORY_OPCODES)
+    return 1 + is_i_format.astype(np.int64) + is_memory
+
+
+# trace.txt as columns, row i is the i-th executed instruction. registers holds the values
+# before the instruction is executed (with $imm of the instruction itself), as unsigned 32 bits.
+class TraceTable(object):
+    def __init__(self, pc, instruction, registers):
+        self.pc = np.asarray(pc, dtype=np.uint32)
+        self.instruction = np.asarray(instruction, dtype=np.uint32)
+        self.registers = np.asarray(registers, dtype=np.uint32).reshape(-1, NUMBER_OF_REGISTERS)
+        # Cycle in which every instruction started, interrupts do not cost cycles
+        costs = instruction_cycles(self.instruction)
+        self.cycle = np.concatenate([np.zeros(min(1, len(costs)), dtype=np.int64), np.cumsum(costs)[:-1]])
+
+    @classmethod
+    def parse(cls, data):
+        if isinstance(data, str):
+            data = data.encode()
+        data = data.replace(b"\r", b"")
+        if data and not data.endswith(b"\n"):
+            data += b"\n"
+        if not data:
+            return cls([], [], np.zeros((0, NUMBER_OF_REGISTERS)))
+
+        table = cls._parse_fixed_width(data)
+        if table is None:
+            try:
+                rows = np.array([[int(field, 16) for field in line.split()] for line in data.splitlines() if line],
+                                dtype=np.uint32)
+            except ValueError as e:
+                raise TraceTableException(f"Invalid trace: {e}")
+            if rows.ndim != 2 or rows.shape[1] != NUMBER_OF_REGISTERS + 2:
+                raise TraceTableException(f"Invalid trace, expected {NUMBER_OF_REGISTERS + 2} fields per line")
+            table = cls(rows[:, 0], rows[:, 1], rows[:, 2:])
+        return table
+
+    @classmethod
+    def _parse_fixed_width(cls, data):
+        # Every line is TRACE_LINE_WIDTH characters, all of the columns are parsed at once
+        if len(data) % (TRACE_LINE_WIDTH + 1) != 0:
+            return None
+        lines = np.frombuffer(data, dtype=np.uint8).reshape(-1, TRACE_LINE_WIDTH + 1)
+        if (lines[:, -1] != ord("\n")).any():
+            return None
+        pc = parse_hex_columns(lines[:, _PC_COLUMNS])
+        instruction = parse_hex_columns(lines[:, _INSTRUCTION_COLUMNS])
+        register_chars = lines[:, _REGISTERS_START - 1:-1].reshape(-1, NUMBER_OF_REGISTERS, _REGISTER_DIGITS + 1)
+        registers = parse_hex_columns(register_chars[:, :, 1:].reshape(-1, _REGISTER_DIGITS))
+        if pc is None or instruction is None or registers is None:
+            return None
+        return cls(pc, instruction, registers)
+
+    @classmethod
+    def from_file(cls, file_path):
+        with open(file_path, "rb") as f:
+            return cls.parse(f.read())
+
+    def __len__(self):
+        return len(self.pc)
+
+    def register(self, reg):
+        # Column of a register by name ("$t0") or number
+        return self.registers[:, _register_index(reg)]
+
+    def signed_register(self, reg):
+        return self.register(reg).view(np.int32)
+
+    def rows_where_pc(self, pc):
+        return np.flatnonzero(self.pc == pc)
+
+    def cycles_where_pc(self, pc):
+        return self.cycle[self.rows_where_pc(pc)]
+
+    def first_row_with_value(self, reg, value):
+        # Returns None if the register never holds the value
+        rows = np.flatnonzero(self.register(reg) == (value & 0xFFFFFFFF))
+        return int(rows[0]) if rows.size else None
+
+    def first_cycle_with_value(self, reg, value):
+        row = self.first_row_with_value(reg, value)
+        return None if row is None else int(self.cycle[row])
+
+    def change_points(self, reg):
+        # Rows where the register holds a different value than in the previous row
+        return np.flatnonzero(np.diff(self.register(reg)) != 0) + 1
+
+
+# Rows that are verified at once by the linear pass of find_first_trace_difference
+_VERIFY_CHUNK_ROWS = 64 * 1024
+
+
+class TraceDifference(object):
+    def __init__(self, row, cycle, reference_record, candidate_record, previous_record=None):
+        # First row (executed instruction) that is different and the cycle it started in
+        self.row = row
+        self.cycle = cycle
+        # TraceRecord of each trace, None if that trace ended before row
+        self.reference_record = reference_record
+        self.candidate_record = candidate_record
+        # Last instruction that was equal in both traces
+        self.previous_record = previous_record
+        self.different_registers = []
+        if reference_record is not None and candidate_record is not None:
+            self.different_registers = [
+                (reg, reference_record.registers[index], candidate_record.registers[index])
+                for reg, index in REGISTER_TO_NUMBER.items()
+                if reference_record.registers[index] != candidate_record.registers[index]]
+
+    def __str__(self):
+        lines = [f"First trace difference at instruction {self.row} (cycle {self.cycle})"]
+        if self.previous_record is not None:
+            lines.append(f"  previous instruction: PC {self.previous_record.pc:03X} "
+                         f"instruction {self.previous_record.instruction:05X}")
+        for name, record in [("reference", self.reference_record), ("candidate", self.candidate_record)]:
+            if record is None:
+                lines.append(f"  {name}: trace ended")
+            else:
+                lines.append(f"  {name}: PC {record.pc:03X} instruction {record.instruction:05X}")
+        for reg, expected_value, actual_value in self.different_registers:
+            lines.append(f"  {reg}: expected {expected_value:08X}, actual {actual_value:08X}")
+        return os.linesep.join(lines)
+
+
+def _chunk_lines(trace_file, start, stop):
+    # (rows, line_width) uint8 view of fixed-width lines without their line endings, None when the
+    # file turned out not to be fixed width
+    record_size = trace_file.record_size()
+    data = trace_file.raw_lines(start, stop)
+    if data is None:
+        return None
+    # The last line may have no line ending
+    data += b"\n" * (-len(data) % record_size)
+    return np.frombuffer(data, dtype=np.uint8).reshape(-1, record_size)[:, :trace_file.line_width()]
+
+
+def _verify_prefix(reference, candidate, rows):
+    # Linear pass over the first rows, returns the first different row (or rows) and its cycle
+    cycle = 0
+    vectorized = reference.is_fixed_width() and candidate.is_fixed_width() and \
+        reference.line_width() == candidate.line_width()
+    for start in range(0, rows, _VERIFY_CHUNK_ROWS):
+        stop = min(start + _VERIFY_CHUNK_ROWS, rows)
+        if vectorized:
+            reference_lines = _chunk_lines(reference, start, stop)
+            candidate_lines = _chunk_lines(candidate, start, stop) if reference_lines is not None else None
+            # Lines of different widths are compared one by one
+            vectorized = candidate_lines is not None
+        if vectorized:
+            different_rows = np.flatnonzero((reference_lines != candidate_lines).any(axis=1))
+            end = stop if different_rows.size == 0 else start + int(different_rows[0])
+            instruction = parse_hex_columns(candidate_lines[:end - start, _INSTRUCTION_COLUMNS])
+            if instruction is None:
+                raise TraceTableException(f"{candidate.file_path}: invalid instruction in lines {start}-{end}")
+            cycle += int(instruction_cycles(instruction).sum())
+            if end < stop:
+                return end, cycle
+        else:
+            for row in range(start, stop):
+                candidate_line = candidate.line(row)
+                if reference.line(row) != candidate_line:
+                    return row, cycle
+                cycle += int(instruction_cycles([int(candidate_line.split()[1], 16)])[0])
+    return rows, cycle
+
+
+def find_first_trace_difference(reference_path, candidate_path):
+    # Finds the first different instruction of two trace.txt files (LF and CRLF are equal) with a
+    # binary search over the records, assuming traces do not converge again after they diverge.
+    # The assumption is then checked by a single linear pass over the equal prefix. Returns a
+    # TraceDifference or None if the traces are equal.
+    with TraceFile(reference_path) as reference, TraceFile(candidate_path) as candidate:
+        common_rows = min(len(reference), len(candidate))
+        low, high = 0, common_rows
+        while low < high:
+            middle = (low + high) // 2
+            if reference.line(middle) != candidate.line(middle):
+                high = middle
+            else:
+                low = middle + 1
+
+        row, cycle = _verify_prefix(reference, candidate, low)
+        if row == common_rows and len(reference) == len(candidate):
+            return None
+        return TraceDifference(
+            row, cycle,
+            reference.record(row) if row < len(reference) else None,
+            candidate.record(row) if row < len(candidate) else None,
+            candidate.record(row - 1) if row > 0 else None)
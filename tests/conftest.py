@@ -0,0 +1,61 @@
+import os
+import warnings
+
+import pytest
+
+from Infra import timing
+from Infra.seeds import SeedManager, inputs_digest
+
+
+seed_manager = SeedManager.from_environment()
+
+
+def pytest_report_header(config):
+    mode = f", replaying {len(seed_manager.replay_entries)} tests" if seed_manager.is_replay() else ""
+    return f"simp test seed: {seed_manager.session_seed}{mode}"
+
+
+def pytest_collection_modifyitems(config, items):
+    # In replay mode only the logged tests are executed
+    if not seed_manager.is_replay():
+        return
+    selected = [item for item in items if seed_manager.should_run(item.nodeid)]
+    deselected = [item for item in items if not seed_manager.should_run(item.nodeid)]
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
+
+
+def pytest_sessionfinish(session, exitstatus):
+    report_path = os.environ.get(timing.REPORT_ENVIRONMENT_VARIABLE)
+    if report_path:
+        timing.recorder.write(report_path)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    if report.when == "call":
+        item.call_failed = report.failed
+
+
+@pytest.fixture(autouse=True)
+def test_seed(request):
+    # Every test gets a seed derived from the session seed and its id, so a failing test is
+    # reproduced by running it alone with the same SIMP_TEST_SEED (or from the replay log)
+    test_id = request.node.nodeid
+    seed = seed_manager.seed_test(test_id)
+    yield seed
+
+    tmp_path = request.node.funcargs.get("tmp_path")
+    if tmp_path is None:
+        input_digest = "-"
+    else:
+        input_digest = inputs_digest(tmp_path.as_posix())
+    if getattr(request.node, "call_failed", False):
+        seed_manager.record_failure(test_id, seed, input_digest)
+    expected_digest = seed_manager.expected_digest(test_id)
+    if expected_digest is not None and expected_digest != input_digest:
+        warnings.warn(f"{test_id}: replayed inputs are different from the logged inputs "
+                      f"({input_digest} != {expected_digest})")
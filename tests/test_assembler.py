@@ -3,8 +3,11 @@ import pathlib
 import random
 import os
 
-from Infra.assembler_wrapper import AssemblerTestRunner, AssemblyLine, PythonAssemblerTestRunner, OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
+from Infra.assembler_wrapper import Assembler, AssemblerException, AssemblerTestRunner, AssemblerBatchRunner, AssemblyLine, PythonAssemblerTestRunner, OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
 from Infra import utils
+from Infra.output_cache import OutputCache
+from Infra.fuzz import ProgramGenerator, generate_random_command, generate_random_command_with_label
+from Infra.minimizer import Minimizer, assembler_oracle
 
 ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
 # ASSEMBLER_PATH =  r"..\ComputerOrganizationProcessor\VisualStudio\Assembler\x64\Debug\Assembler.exe"
@@ -20,6 +23,43 @@ def test_python_assembler():
     runner.set_expected_output_from_file(f"{TESTS_BASE_FOLDER}/resources/memin.txt")
     runner.run()
 
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_python_assembler_word_commands():
+    runner = PythonAssemblerTestRunner(ASSEMBLER_PATH)
+    runner.set_input_data_from_str(os.linesep.join([
+        "add $t0, $zero, $imm, 1",
+        ".word 6 16",
+        ".word 1 7 # overrides the immediate",
+        "halt $zero, $zero, $zero, 0",
+    ]))
+    runner.set_expected_output_from_str("00701\n00007\n15000\n00000\n00000\n00000\n00010\n")
+    runner.run()
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_python_assembler_error_line_number():
+    assembler = Assembler(os.linesep.join([
+        "# comment",
+        "",
+        "Label:",
+        "add $t0, $zero, $imm, 1",
+        "add $t0, $zero, $imm",
+    ]))
+    with pytest.raises(AssemblerException, match="line 5"):
+        assembler.run()
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_python_assembler_stream(tmp_path):
+    memin_path = tmp_path / "memin.txt"
+    with open(f"{TESTS_BASE_FOLDER}/resources/fib.asm", "r") as src, open(memin_path, "w") as sink:
+        number_of_words = Assembler().assemble_stream(src, sink)
+    with open(f"{TESTS_BASE_FOLDER}/resources/memin.txt", "r") as f:
+        expected_lines = f.read().splitlines()
+    assert memin_path.read_text().splitlines() == expected_lines
+    assert number_of_words == len(expected_lines)
+
 @pytest.mark.sanity
 @pytest.mark.assembler
 def test_assembler_sanity_custom_expected_output(tmp_path):
@@ -35,6 +75,20 @@ def test_assembler_sanity_compare_from_python(tmp_path):
     runner.set_input_data_from_str("add $zero, $zero, $zero, 0")
     runner.run()
 
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_assembler_cache(tmp_path):
+    cache = OutputCache((tmp_path / "cache").as_posix())
+    for i in range(2):
+        test_folder = tmp_path / f"run_{i}"
+        test_folder.mkdir()
+        runner = AssemblerTestRunner(ASSEMBLER_PATH, test_folder.as_posix(), cache=cache)
+        runner.set_input_data_from_str("add $t0, $zero, $imm, 5")
+        runner.run()
+    # The second run is served from the cache without executing the assembler
+    assert runner.last_execution is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
 @pytest.mark.sanity
 @pytest.mark.assembler
 @pytest.mark.parametrize("opcode", [op for op in OPCODE_TO_NUMBER.keys()])
@@ -78,6 +132,38 @@ def test_assembler_all_ops_and_regs(tmp_path, opcode, rt, rs, rd):
     runner.set_input_data_from_str(f"{opcode} {rt}, {rs}, {rd}, 0")
     runner.run()
 
+@pytest.mark.stress
+@pytest.mark.assembler
+@pytest.mark.parametrize("opcode", [op for op in OPCODE_TO_NUMBER.keys()])
+def test_assembler_all_ops_and_regs_batch(tmp_path, opcode):
+    runner = AssemblerBatchRunner(ASSEMBLER_PATH, tmp_path.as_posix())
+    for rt in REGISTER_TO_NUMBER.keys():
+        for rs in REGISTER_TO_NUMBER.keys():
+            for rd in REGISTER_TO_NUMBER.keys():
+                runner.add(f"{opcode} {rt}, {rs}, {rd}, 0")
+    runner.run()
+
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_assembler_batch_failures_and_cache(tmp_path):
+    cache = OutputCache((tmp_path / "cache").as_posix())
+    runner = AssemblerBatchRunner(ASSEMBLER_PATH, (tmp_path / "batch").as_posix(), workers=2, cache=cache)
+    for value in range(4):
+        runner.add(f"add $t0, $zero, $imm, {value}")
+    runner.run()
+    assert all(execution is not None for execution in runner.executions)
+    # The second run is served by the cache
+    runner.run()
+    assert runner.executions == [None] * 4
+
+    # Failed cases report the exit code and stderr of the C assembler
+    runner.add("nop $t0, $zero, $zero, 0", expected_output="00000")
+    with pytest.raises(AssertionError) as e:
+        runner.run()
+    assert not runner.executions[-1].succeeded()
+    assert str(runner.executions[-1]) in str(e.value)
 
 @pytest.mark.sanity
 @pytest.mark.assembler
@@ -96,36 +182,6 @@ def test_assembler_imm_in_all_regs(tmp_path, imm):
     runner.set_input_data_from_str(f"add $imm, $imm, $imm, {imm}")
     runner.run()
 
-def generate_random_command(newline=True, add_random_chars=True):
-    opcode = random.choice([op for op in OPCODE_TO_NUMBER.keys()])
-    rt = random.choice([reg for reg in REGISTER_TO_NUMBER.keys()])
-    rs = random.choice([reg for reg in REGISTER_TO_NUMBER.keys()])
-    rd = random.choice([reg for reg in REGISTER_TO_NUMBER.keys()])
-    if add_random_chars:
-        break1 = random.choice(10*[" "] + ['\t', "\t\t", "  ", " \t ", "\t \t"])
-        break2 = random.choice(10*[" "] + ['\t', "\t\t", "  ", " \t ", "\t \t"])
-        break3 = random.choice(10*[" "] + ['\t', "\t\t", "  ", " \t ", "\t \t"])
-        break4 = random.choice(10*[" "] + ['\t', "\t\t", "  ", " \t ", "\t \t"])
-        command = f"{opcode}{break1}{rt},{break2}{rs},{break3}{rd},{break4}0"
-    else:
-        command = f"{opcode} {rt}, {rs}, {rd}, 0"
-    if newline:
-        command += os.linesep
-
-    return command
-
-def generate_random_command_with_label(label, newline=True):
-    opcode = random.choice([op for op in OPCODE_TO_NUMBER.keys()])
-    rt = random.choice([reg for reg in REGISTER_TO_NUMBER.keys() if reg != "$imm"])
-    rs = random.choice([reg for reg in REGISTER_TO_NUMBER.keys() if reg != "$imm"])
-    rd = random.choice([reg for reg in REGISTER_TO_NUMBER.keys() if reg != "$imm"])
-    command = f"{opcode} {rt}, {rs}, {rd}, {label}"
-
-    if newline:
-        command += os.linesep
-
-    return command
-
 def generate_word_command(address, value, newline=True):
     command = f".word {address} {value}"
 
@@ -274,7 +330,13 @@ def random_command_generation(tmp_path, number_of_commands):
     runner = AssemblerTestRunner(ASSEMBLER_PATH, tmp_path.as_posix())
     runner.set_input_data_from_str(command)
     print(command)
-    runner.run()
+    try:
+        runner.run()
+    except AssertionError:
+        # Shrink the program to the lines that are needed for the assemblers to disagree
+        oracle = assembler_oracle(ASSEMBLER_PATH, (tmp_path / "minimize").as_posix())
+        minimal_command = Minimizer(oracle).minimize(command)
+        raise AssertionError(f"Assemblers disagree, minimal program:{os.linesep}{minimal_command}")
 
 
 @pytest.mark.sanity
@@ -289,3 +351,52 @@ def test_assembler_random_command_generation(tmp_path, number_of_commands):
 @pytest.mark.parametrize("iter_number", [x for x in range(5)])
 def test_assembler_random_command_generation_stress(tmp_path, number_of_commands, iter_number):
     random_command_generation(tmp_path, number_of_commands)
+
+
+def fuzz_coverage(tmp_path, number_of_commands):
+    # Coverage guided programs, generated until every (opcode, register slot, imm range, label, .word)
+    # combination was used, and assembled in a single batch
+    generator = ProgramGenerator()
+    programs = generator.until_covered(number_of_commands, number_of_labels=2, number_of_words=2, batch_size=8)
+    assert generator.coverage.is_complete(), str(generator.coverage)
+    runner = AssemblerBatchRunner(ASSEMBLER_PATH, tmp_path.as_posix())
+    for program in programs:
+        runner.add(program)
+    runner.run()
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_assembler_fuzz_coverage(tmp_path):
+    fuzz_coverage(tmp_path, 50)
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_assembler_fuzz_coverage_i_format():
+    # imm and label points are only credited to I-format commands, the immediate of R-format commands is dropped
+    generator = ProgramGenerator(random.Random(3))
+    program = generator.program(500, number_of_labels=5)
+    commands = [AssemblyLine(line.split(":")[-1].strip()) for line in program.splitlines() if not line.endswith(":")]
+    imm_points = sum(count for point, count in generator.coverage.counts.items() if point[0] in ["imm", "label"])
+    assert imm_points == sum(command.is_I_format() for command in commands)
+    assert 0 < imm_points < len(commands)
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_assembler_fuzz_coverage_without_labels():
+    # Label points can not be covered without labels, nor .word points without words
+    generator = ProgramGenerator()
+    programs = generator.until_covered(20, number_of_labels=0, number_of_words=0, batch_size=8)
+    assert len(programs) < 10000
+    assert generator.coverage.is_complete(["register", "imm"])
+    assert not generator.coverage.is_complete()
+    assert all(point[0] in ["label", "word"] for point in generator.coverage.uncovered())
+
+
+@pytest.mark.stress
+@pytest.mark.assembler
+@pytest.mark.parametrize("number_of_commands", [5, 20, 100, 500, 999])
+def test_assembler_fuzz_coverage_stress(tmp_path, number_of_commands):
+    fuzz_coverage(tmp_path, number_of_commands)
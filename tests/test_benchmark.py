@@ -0,0 +1,129 @@
+import pytest
+import os
+
+from Infra.benchmark import (BASELINE_ENVIRONMENT_VARIABLE, DEFAULT_REPEATS, DEFAULT_THRESHOLD,
+                             REPEATS_ENVIRONMENT_VARIABLE, THRESHOLD_ENVIRONMENT_VARIABLE,
+                             UPDATE_BASELINE_ENVIRONMENT_VARIABLE, Baseline, BenchmarkResult, arithmetic_program,
+                             disk_program, interrupt_program, irq2in_data, measure_binaries, measure_python_assembler,
+                             word_program)
+from Infra.disk_image import DiskImage
+from Infra.output_cache import OutputCache
+from Infra.simulator_wrapper import SimulatorTestRunner
+
+
+ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
+SIMULATOR_PATH = "../ComputerOrganizationProcessor/build/simulator"
+
+PROGRAM_SIZES = [10, 64, 256, 1024, 4096]
+WORD_COUNTS = [256, 4095]
+REPEATS = int(os.environ.get(REPEATS_ENVIRONMENT_VARIABLE, DEFAULT_REPEATS))
+THRESHOLD = float(os.environ.get(THRESHOLD_ENVIRONMENT_VARIABLE, DEFAULT_THRESHOLD))
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    # Results of the module are checked against the baseline file, and are written to it on
+    # SIMP_BENCHMARK_UPDATE=1
+    baseline_path = os.environ.get(BASELINE_ENVIRONMENT_VARIABLE)
+    baseline = Baseline.load(baseline_path) if baseline_path else Baseline()
+    yield baseline
+    if baseline_path and os.environ.get(UPDATE_BASELINE_ENVIRONMENT_VARIABLE) == "1":
+        baseline.update_checked()
+        baseline.save(baseline_path)
+
+
+def check_results(baseline, results):
+    # The results are reported with the regressions
+    regressions = [regression for regression in (baseline.check(result, THRESHOLD) for result in results)
+                   if regression is not None]
+    assert not regressions, os.linesep.join([str(regression) for regression in regressions] +
+                                            [str(result) for result in results])
+
+
+@pytest.mark.benchmark
+@pytest.mark.assembler
+@pytest.mark.parametrize("number_of_instructions", PROGRAM_SIZES)
+def test_benchmark_python_assembler(baseline, number_of_instructions):
+    program = arithmetic_program(number_of_instructions)
+    check_results(baseline, [measure_python_assembler(f"python_assembler.{number_of_instructions}", program, REPEATS)])
+
+
+@pytest.mark.benchmark
+@pytest.mark.assembler
+@pytest.mark.parametrize("number_of_words", WORD_COUNTS)
+def test_benchmark_python_assembler_words(baseline, number_of_words):
+    program = word_program(number_of_words)
+    check_results(baseline, [measure_python_assembler(f"python_assembler.words_{number_of_words}", program, REPEATS)])
+
+
+@pytest.mark.benchmark
+@pytest.mark.simulator
+@pytest.mark.parametrize("number_of_instructions", PROGRAM_SIZES)
+def test_benchmark_binaries(tmp_path, baseline, number_of_instructions):
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    results = measure_binaries(f"arithmetic_{number_of_instructions}", runner,
+                               arithmetic_program(number_of_instructions), repeats=REPEATS)
+    assert results[1].instructions == number_of_instructions
+    check_results(baseline, results)
+
+
+@pytest.mark.benchmark
+@pytest.mark.simulator
+@pytest.mark.parametrize("number_of_words", WORD_COUNTS)
+def test_benchmark_binaries_words(tmp_path, baseline, number_of_words):
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    check_results(baseline, measure_binaries(f"words_{number_of_words}", runner, word_program(number_of_words),
+                                             repeats=REPEATS))
+
+
+@pytest.mark.benchmark
+@pytest.mark.simulator
+def test_benchmark_binaries_disk(tmp_path, baseline):
+    # Every sector is read and written back, so diskout.txt is equal to diskin.txt
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    disk_image = DiskImage.random(seed=0)
+    results = measure_binaries("disk", runner, disk_program(), disk_image.text().decode(), repeats=REPEATS)
+    assert (runner.read_diskout_image().words == disk_image.words).all()
+    check_results(baseline, results)
+
+
+@pytest.mark.benchmark
+@pytest.mark.simulator
+def test_benchmark_binaries_interrupts(tmp_path, baseline):
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    results = measure_binaries("interrupts", runner, interrupt_program(iterations=20000, timer_max=63),
+                               irq2in=irq2in_data(period=97, number_of_interrupts=500), repeats=REPEATS)
+    assert runner.read_regout()["$s0"] > 0
+    check_results(baseline, results)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_benchmark_baseline_regression(tmp_path):
+    baseline_path = os.path.join(tmp_path, "baseline.json")
+    baseline = Baseline()
+    baseline.update(BenchmarkResult("simulator", [1.0, 1.0, 1.2], instructions=1000, cycles=2000))
+    baseline.save(baseline_path)
+
+    baseline = Baseline.load(baseline_path)
+    assert baseline.summaries["simulator"]["instructions_per_second"] == 1000
+    assert baseline.summaries["simulator"]["cycles_per_second"] == 2000
+    assert baseline.regression(BenchmarkResult("simulator", [1.2]), threshold=0.25) is None
+    assert baseline.regression(BenchmarkResult("simulator", [1.3]), threshold=0.25) is not None
+    assert baseline.regression(BenchmarkResult("assembler", [100.0]), threshold=0.25) is None
+
+    baseline.check(BenchmarkResult("assembler", [0.5]))
+    baseline.update_checked()
+    assert baseline.summaries["assembler"]["p50"] == 0.5
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_benchmark_keeps_runner_caches(tmp_path):
+    cache = OutputCache(os.path.join(tmp_path, "cache"))
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix(), assembler_cache=cache,
+                                 simulator_cache=cache)
+    results = measure_binaries("arithmetic", runner, arithmetic_program(10), repeats=2)
+    assert [len(result.latencies) for result in results] == [2, 2]
+    assert runner.assembler_runner.cache is cache and runner.simulator_cache is cache
+    assert cache.hits == 0
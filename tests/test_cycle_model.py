@@ -0,0 +1,166 @@
+import pytest
+import pathlib
+import os
+
+from Infra.assembler_wrapper import Assembler, AssemblyLine, OPCODE_TO_NUMBER
+from Infra.benchmark import disk_program, interrupt_program, irq2in_data
+from Infra.cycle_model import (command_cycles, find_cycle_difference, io_timing_differences, predict_program_cycles,
+                               read_cycles, trace_cycles)
+from Infra.hwregtrace import HwRegTrace
+from Infra.simulator_model import SimulatorModel
+from Infra.simulator_wrapper import SimulatorTestRunner
+from Infra.trace_table import TraceTable, instruction_cycles
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
+SIMULATOR_PATH = "../ComputerOrganizationProcessor/build/simulator"
+
+IO_TIMING_PROGRAM = os.linesep.join([
+    "in $t0, $zero, $imm, 8  # clks",
+    "add $t1, $zero, $imm, 5",
+    "out $t1, $zero, $imm, 13  # timermax",
+    "add $t1, $zero, $imm, 1",
+    "out $t1, $zero, $imm, 11  # timerenable",
+    "in $t2, $zero, $imm, 12  # timercurrent",
+    "mul $t2, $t2, $t2, 0",
+    "in $t2, $zero, $imm, 12",
+    "add $t2, $zero, $imm, 2048",
+    "out $t2, $zero, $imm, 16  # diskbuffer",
+    "out $t1, $zero, $imm, 14  # disk read",
+    "in $t2, $zero, $imm, 17  # diskstatus",
+    "out $zero, $zero, $imm, 8  # clks",
+    "in $t0, $zero, $imm, 8",
+    "in $t2, $zero, $imm, 12",
+    "halt $zero, $zero, $zero, 0",
+]) + os.linesep
+
+
+def model_run(program, diskin="", irq2in=""):
+    return SimulatorModel(Assembler(program).run(), diskin, irq2in, max_cycles=10**6).run()
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+@pytest.mark.parametrize("opcode", OPCODE_TO_NUMBER.keys())
+@pytest.mark.parametrize("registers", ["$t0, $t1, $t2", "$t0, $t1, $imm", "$imm, $zero, $zero"])
+def test_command_cycles_match_instruction_cycles(opcode, registers):
+    assembly_line = AssemblyLine(f"{opcode} {registers}, 7")
+    assert command_cycles(assembly_line) == instruction_cycles(assembly_line.encode()[:1])[0]
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_predict_program_cycles():
+    program = os.linesep.join([
+        "add $t0, $zero, $imm, 5",
+        "sw $t0, $zero, $imm, 100",
+        "lw $t1, $zero, $t0, 0",
+        "out $t0, $zero, $imm, 9  # leds",
+        "halt $zero, $zero, $zero, 0",
+        ".word 200 5",
+    ])
+    assert predict_program_cycles(program) == 2 + 3 + 2 + 2 + 1
+    assert predict_program_cycles(program) == model_run(program).cycles
+    # The executed path depends on register values
+    assert predict_program_cycles("beq $imm, $zero, $zero, 0" + os.linesep + program) is None
+    assert predict_program_cycles("out $t0, $zero, $imm, 2  # irq2enable" + os.linesep + program) is None
+    assert predict_program_cycles("out $t0, $zero, $t1, 0" + os.linesep + program) is None
+    assert predict_program_cycles(IO_TIMING_PROGRAM) is None
+    # sw overrides an executed command
+    assert predict_program_cycles(program.replace("sw $t0, $zero, $imm, 100", "sw $t0, $zero, $imm, 3")) is None
+    # .word overrides an executed command
+    assert predict_program_cycles(program + os.linesep + ".word 2 5") is None
+    assert predict_program_cycles("add $t0, $zero, $imm, 5") is None
+    # Programs that the python tokenizer rejects are left to the trace based check
+    assert predict_program_cycles(f".word 0x20 7{os.linesep}halt $zero, $zero, $zero, 0{os.linesep}") is None
+    assert predict_program_cycles(f"add $t0, $zero{os.linesep}halt $zero, $zero, $zero, 0{os.linesep}") is None
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_cycle_model_example_fib():
+    trace_table = TraceTable.from_file(os.path.join(EXAMPLE_FIB_DIR, "trace.txt"))
+    cycles = read_cycles(os.path.join(EXAMPLE_FIB_DIR, "cycles.txt"))
+    with open(os.path.join(EXAMPLE_FIB_DIR, "fib.asm"), "r") as f:
+        program = f.read()
+    assert trace_cycles(trace_table) == cycles == 1706
+    assert predict_program_cycles(program) is None
+    assert find_cycle_difference(cycles, trace_table, program) is None
+    difference = find_cycle_difference(cycles + 1, trace_table, program)
+    assert difference is not None and "1707" in str(difference)
+    assert io_timing_differences(HwRegTrace.from_file(os.path.join(EXAMPLE_FIB_DIR, "hwregtrace.txt"))) == []
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("program, irq2in", [
+    (IO_TIMING_PROGRAM, ""),
+    (disk_program(number_of_sectors=2), ""),
+    (interrupt_program(iterations=300, timer_max=17), irq2in_data(period=41, number_of_interrupts=20)),
+])
+def test_io_timing_model(program, irq2in):
+    model = model_run(program, irq2in=irq2in)
+    hwregtrace = HwRegTrace.parse("\n".join(model.hwregtrace))
+    assert io_timing_differences(hwregtrace) == []
+    assert trace_cycles(TraceTable.parse("\n".join(model.trace))) == model.cycles
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_io_timing_model_differences():
+    model = model_run(IO_TIMING_PROGRAM)
+    # Every read one cycle later
+    lines = [line.split() for line in model.hwregtrace]
+    shifted = [f"{int(cycle) + 1 if direction == 'READ' else cycle} {direction} {register} {value}"
+               for cycle, direction, register, value in lines]
+    differences = io_timing_differences(HwRegTrace.parse("\n".join(shifted)))
+    assert any("clks" in difference for difference in differences)
+    assert any("timercurrent" in difference for difference in differences)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_cycles_and_io_timing(tmp_path):
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    runner.validate_cycles = True
+    runner.set_input_data_from_str(IO_TIMING_PROGRAM)
+    runner.run()
+    runner.validate_io_timing()
+
+    cycles = read_cycles(runner.cycles_txt_path)
+    with open(runner.cycles_txt_path, "w") as f:
+        f.write(f"{cycles + 1}\n")
+    with pytest.raises(AssertionError):
+        runner._validate_cycles()
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("timer_max", [3, 7])
+def test_simulator_io_timing_polling(tmp_path, timer_max):
+    # Reads clks, timercurrent and diskstatus (polled until the disk is done) and checks them
+    # against the cycle counter, the timer and the 1024 cycles disk latency
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    runner.validate_cycles = True
+    asm_input = os.linesep.join([
+        f"add $t0, $zero, $imm, {timer_max}",
+        "out $t0, $zero, $imm, 13 # timermax",
+        "add $t0, $zero, $imm, 1",
+        "out $t0, $zero, $imm, 11 # timerenable",
+        "in $t1, $zero, $imm, 12 # timercurrent",
+        "in $t1, $zero, $imm, 8 # clks",
+        "add $t0, $zero, $imm, 2048",
+        "out $t0, $zero, $imm, 16 # diskbuffer",
+        "add $t0, $zero, $imm, 1",
+        "out $t0, $zero, $imm, 14 # disk read",
+        "L1:",
+        "in $t1, $zero, $imm, 12 # timercurrent",
+        "in $t1, $zero, $imm, 17 # diskstatus",
+        "bne $imm, $t1, $zero, L1",
+        "in $t1, $zero, $imm, 8 # clks",
+        "halt $zero, $zero, $zero, 0"])
+    runner.set_input_data_from_str(asm_input)
+    runner.run()
+    runner.validate_io_timing()
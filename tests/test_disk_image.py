@@ -0,0 +1,50 @@
+import pytest
+import pathlib
+import os
+
+import numpy as np
+
+from Infra.disk_image import DiskImage, parse_hex_words, render_hex_words
+from Infra.simulator_model import DISK_SIZE, SECTOR_SIZE, parse_hex_lines
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_disk_image_render_and_parse():
+    disk_image = DiskImage.random(seed=1)
+    assert disk_image.text() == os.linesep.join(f"{word:05x}" for word in disk_image.words).encode()
+    assert (DiskImage.parse(disk_image.text()).words == disk_image.words).all()
+    # Images are generated (and rendered) once per seed
+    assert DiskImage.random(seed=1) is disk_image
+    assert (disk_image.words < 2**20).all()
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("file_name", ["diskin.txt", "diskout.txt", "memin.txt", "memout.txt"])
+def test_parse_hex_words_example_files(file_name):
+    with open(os.path.join(EXAMPLE_FIB_DIR, file_name), "r") as f:
+        data = f.read()
+    assert list(parse_hex_words(data, DISK_SIZE)) == parse_hex_lines(data, DISK_SIZE)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_parse_hex_words_mixed_widths():
+    assert list(parse_hex_words("1\r\nABCDE\r\n\r\nff\n", 5)) == [1, 0xABCDE, 0xFF, 0, 0]
+    assert render_hex_words([1, 0xABCDE], line_separator="\n") == b"00001\nabcde"
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_disk_image_compare_sector():
+    words = np.arange(DISK_SIZE, dtype=np.uint32)
+    disk_image = DiskImage(words)
+    expected = words[2*SECTOR_SIZE:3*SECTOR_SIZE].copy()
+    assert not disk_image.compare_sector(2, expected).size
+    expected[[3, 7]] = 0
+    assert list(disk_image.compare_sector(2, expected)) == [3, 7]
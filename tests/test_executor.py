@@ -0,0 +1,74 @@
+import pytest
+import sys
+
+from Infra.executor import BinaryExecutor, ExecutionException, resource
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_executor_output():
+    execution = BinaryExecutor().run([sys.executable, "-c",
+                                      "import sys; print('out'); sys.stderr.write('x' * 100000); sys.exit(3)"])
+    assert not execution.timed_out and not execution.succeeded()
+    assert execution.returncode == 3
+    assert execution.stdout.strip() == b"out"
+    assert execution.stderr == b"x" * 100000
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_executor_timeout():
+    execution = BinaryExecutor(timeout=0.5).run(["sleep", "10"])
+    assert execution.timed_out and not execution.succeeded()
+    assert execution.returncode is None
+    assert execution.elapsed_time < 5
+    assert "timed out" in str(execution)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_executor_timeout_with_grandchild():
+    # The background sleep inherits stdout and stderr and is not killed with its parent
+    execution = BinaryExecutor(timeout=0.5).run(["/bin/sh", "-c", "echo started; sleep 5 & sleep 10"])
+    assert execution.timed_out
+    assert execution.stdout == b"started\n"
+    assert execution.elapsed_time < 4
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_executor_missing_binary(tmp_path):
+    with pytest.raises(ExecutionException):
+        BinaryExecutor().run([(tmp_path / "missing").as_posix()])
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.skipif(resource is None, reason="rlimits are not supported")
+def test_executor_memory_limit():
+    program = "bytearray(1024 * 1024 * 1024)"
+    execution = BinaryExecutor(memory_limit=512 * 1024 * 1024).run([sys.executable, "-c", program])
+    assert execution.returncode != 0
+    assert b"MemoryError" in execution.stderr
+    assert BinaryExecutor().run([sys.executable, "-c", program]).succeeded()
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.skipif(resource is None, reason="rlimits are not supported")
+def test_executor_limits_are_set_before_exec():
+    program = "import resource as r; print(r.getrlimit(r.RLIMIT_AS)[0], r.getrlimit(r.RLIMIT_CPU)[0])"
+    execution = BinaryExecutor(cpu_time_limit=5, memory_limit=512 * 1024 * 1024).run([sys.executable, "-c", program])
+    assert execution.stdout.split() == [str(512 * 1024 * 1024).encode(), b"5"]
+    with pytest.raises(ExecutionException):
+        BinaryExecutor(memory_limit=512 * 1024 * 1024).run(["missing_binary_of_the_executor_test"])
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.skipif(resource is None, reason="rlimits are not supported")
+def test_executor_cpu_time_limit():
+    execution = BinaryExecutor(timeout=30, cpu_time_limit=1).run([sys.executable, "-c", "while True: pass"])
+    assert not execution.timed_out
+    assert execution.returncode < 0
+    assert execution.elapsed_time < 20
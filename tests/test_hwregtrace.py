@@ -0,0 +1,50 @@
+import pytest
+import pathlib
+import os
+
+from Infra.hwregtrace import HwRegTrace, READ, WRITE
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_hwregtrace_example_fib():
+    hwregtrace_path = os.path.join(EXAMPLE_FIB_DIR, "hwregtrace.txt")
+    with open(hwregtrace_path, "r") as f:
+        lines = [line.split() for line in f.read().splitlines()]
+    hwregtrace = HwRegTrace.from_file(hwregtrace_path)
+    assert len(hwregtrace) == len(lines)
+    for row, (cycle, direction, name, value) in enumerate(lines):
+        assert hwregtrace.cycle[row] == int(cycle)
+        assert hwregtrace.direction[row] == (WRITE if direction == "WRITE" else READ)
+        assert hwregtrace.register_name(row) == name
+        assert hwregtrace.value[row] == int(value, 16)
+
+    leds_writes = [(int(cycle), int(value, 16)) for cycle, direction, name, value in lines
+                   if name == "leds" and direction == "WRITE"]
+    cycles, values = hwregtrace.writes("leds")
+    assert list(zip(cycles, values)) == leds_writes
+    middle_cycle = leds_writes[len(leds_writes) // 2][0]
+    cycles, values = hwregtrace.writes("leds", start_cycle=middle_cycle)
+    assert list(zip(cycles, values)) == leds_writes[len(leds_writes) // 2:]
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_hwregtrace_queries():
+    hwregtrace = HwRegTrace.parse(os.linesep.join([
+        "3 WRITE timermax 00000010",
+        "5 WRITE leds 00000001",
+        "5 READ leds 00000001",
+        "9 WRITE timermax 00000020",
+        "12 WRITE leds 00000002",
+    ]))
+    assert list(hwregtrace.events("leds")) == [1, 2, 4]
+    assert list(hwregtrace.events("leds", direction=READ)) == [2]
+    assert list(hwregtrace.events(start_cycle=5, end_cycle=12)) == [1, 2, 3]
+    assert list(hwregtrace.writes("timermax")[1]) == [0x10, 0x20]
+    assert hwregtrace.value_at("timermax", 9) == 0x10
+    assert hwregtrace.value_at("display7seg", 100) is None
@@ -0,0 +1,53 @@
+import pytest
+import random
+import os
+
+from Infra.assembler_wrapper import Assembler, AssemblerException
+from Infra.fuzz import ProgramGenerator
+from Infra.minimizer import Minimizer, MinimizerException, assembler_oracle
+
+
+ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_minimizer_lines():
+    program = ProgramGenerator(random.Random(5)).program(300, number_of_labels=3, number_of_words=10)
+    failing_lines = [line for line in program.splitlines() if line.startswith("mul")][:1] + \
+        [line for line in program.splitlines() if line.startswith(".word")][:1]
+
+    def oracle(candidate):
+        return all(line in candidate.splitlines() for line in failing_lines)
+
+    minimizer = Minimizer(oracle, workers=4)
+    assert minimizer.minimize(program).splitlines() == [line for line in program.splitlines() if line in failing_lines]
+    # Every candidate is checked once
+    assert minimizer.checks == len(minimizer.verdicts)
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_minimizer_keeps_labels():
+    # Fails only while the label is used, so the label must stay for the program to assemble
+    def oracle(candidate):
+        try:
+            Assembler(candidate).run()
+        except AssemblerException:
+            return False
+        return "jal $ra, $imm, $zero, Target" in candidate
+
+    program = os.linesep.join(["add $t0, $zero, $imm, 1", "Target:", "sub $t1, $t0, $t0, 0",
+                               "jal $ra, $imm, $zero, Target", ".word 5 7", "halt $zero, $zero, $zero, 0"])
+    assert Minimizer(oracle).minimize(program).splitlines() == \
+        ["Target:", "jal $ra, $imm, $zero, Target"]
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_minimizer_assembler_oracle(tmp_path):
+    oracle = assembler_oracle(ASSEMBLER_PATH, tmp_path.as_posix())
+    with pytest.raises(MinimizerException):
+        Minimizer(oracle).minimize("add $t0, $zero, $imm, 1")
+    # The python assembler crashes on hex immediates
+    assert not oracle(f"add $t0, $zero, $imm, 0x10{os.linesep}halt $zero, $zero, $zero, 0{os.linesep}")
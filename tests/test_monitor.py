@@ -0,0 +1,36 @@
+import pytest
+import pathlib
+import os
+
+import numpy as np
+
+from Infra.monitor import MonitorFrame
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_monitor_txt_and_yuv_example_fib():
+    txt_frame = MonitorFrame.from_file(os.path.join(EXAMPLE_FIB_DIR, "monitor.txt"))
+    yuv_frame = MonitorFrame.from_file(os.path.join(EXAMPLE_FIB_DIR, "monitor.yuv"))
+    assert (txt_frame.pixels == yuv_frame.pixels).all()
+    assert not txt_frame.diff(yuv_frame)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_monitor_diff(tmp_path):
+    reference = MonitorFrame.from_yuv(os.path.join(EXAMPLE_FIB_DIR, "monitor.yuv"))
+    pixels = reference.pixels.copy()
+    pixels[10, 20] ^= 0xFF
+    pixels[30, 5] ^= 0x01
+    difference = MonitorFrame(pixels).diff(reference)
+    assert difference.count == 2
+    assert difference.bounding_box == (10, 5, 30, 20)
+
+    png_path = tmp_path / "diff.png"
+    MonitorFrame(pixels).write_diff_png(reference, png_path.as_posix())
+    assert png_path.read_bytes().startswith(b"\x89PNG")
@@ -0,0 +1,107 @@
+import pytest
+import pathlib
+import os
+
+from Infra.output_files import MappedTextFile, HexWordsFile, TraceFile, compare_output_files, find_first_difference
+from Infra.simulator_model import MEMORY_SIZE, parse_hex_lines
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_trace_file_records():
+    trace_path = os.path.join(EXAMPLE_FIB_DIR, "trace.txt")
+    with open(trace_path, "rb") as f:
+        lines = f.read().splitlines()
+    with TraceFile(trace_path) as trace:
+        assert trace.is_fixed_width()
+        assert len(trace) == len(lines)
+        assert trace[-1] == lines[-1]
+        record = trace.record(len(lines) // 2)
+        assert str(record).encode() == lines[len(lines) // 2]
+        assert [str(record).encode() for record in trace.records()] == lines
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_hex_words_file():
+    memout_path = os.path.join(EXAMPLE_FIB_DIR, "memout.txt")
+    with open(memout_path, "r") as f:
+        expected_words = parse_hex_lines(f.read(), MEMORY_SIZE)
+    with HexWordsFile(memout_path) as memout:
+        assert memout.words(0, MEMORY_SIZE) == expected_words
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_mapped_text_file_different_widths(tmp_path):
+    file_path = tmp_path / "leds.txt"
+    file_path.write_bytes(b"1 00000001\r\n100 00000002\r\n3 00000003")
+    with MappedTextFile(file_path.as_posix()) as mapped_file:
+        assert len(mapped_file) == 3
+        assert mapped_file[1] == b"100 00000002"
+        assert list(mapped_file) == [b"1 00000001", b"100 00000002", b"3 00000003"]
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("data, expected_lines", [
+    (b"aa\nb\n\nc\n", [b"aa", b"b", b"", b"c"]),
+    (b"a\n\nbb\n", [b"a", b"", b"bb"]),
+    (b"aa\nbb\ncc", [b"aa", b"bb", b"cc"]),
+    (b"aa\r\nbb\r\n", [b"aa", b"bb"]),
+])
+def test_mapped_text_file_line_count(tmp_path, data, expected_lines):
+    # The size of these files fits the width of the first line, only some of them are fixed width
+    file_path = tmp_path / "lines.txt"
+    file_path.write_bytes(data)
+    is_fixed_width = len(set(len(line) for line in expected_lines)) == 1
+    with MappedTextFile(file_path.as_posix()) as mapped_file:
+        assert mapped_file.validate() == is_fixed_width
+        assert len(mapped_file) == len(expected_lines)
+        assert list(mapped_file) == expected_lines
+    # Without validate(), the lines that are read are checked
+    with MappedTextFile(file_path.as_posix()) as mapped_file:
+        assert [mapped_file[i] for i in range(len(expected_lines))] == expected_lines
+        assert len(mapped_file) == len(expected_lines)
+        assert mapped_file.is_fixed_width() == is_fixed_width
+    with MappedTextFile(file_path.as_posix()) as mapped_file:
+        if mapped_file.is_fixed_width():
+            assert (mapped_file.raw_lines(0, len(mapped_file)) is not None) == is_fixed_width
+            assert len(mapped_file) == len(expected_lines)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_compare_output_files(tmp_path):
+    base_path = os.path.join(EXAMPLE_FIB_DIR, "memout.txt")
+    with open(base_path, "rb") as f:
+        data = f.read()
+    # Line endings and trailing zeros are ignored
+    actual_path = tmp_path / "memout.txt"
+    actual_path.write_bytes(data.replace(b"\r\n", b"\n") + b"00000\n00000\n")
+    compare_output_files(base_path, actual_path.as_posix())
+
+    actual_path.write_bytes(data.replace(b"\r\n", b"\n").replace(b"\n", b"\n00002\n", 1))
+    with pytest.raises(AssertionError, match="line 2"):
+        compare_output_files(base_path, actual_path.as_posix())
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("block_size", [7, 64 * 1024])
+def test_find_first_difference(tmp_path, block_size):
+    base_path = os.path.join(EXAMPLE_FIB_DIR, "trace.txt")
+    with open(base_path, "rb") as f:
+        lines = f.read().splitlines()
+    lines[100] = lines[100][:10] + b"F" + lines[100][11:]
+    actual_path = tmp_path / "trace.txt"
+    actual_path.write_bytes(b"\n".join(lines))
+
+    difference = find_first_difference(base_path, actual_path.as_posix(), block_size=block_size)
+    assert (difference.line_number, difference.column) == (101, 11)
+    assert difference.actual_line == lines[100]
+    assert difference.context == lines[98:100]
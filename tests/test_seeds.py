@@ -0,0 +1,69 @@
+import pytest
+import os
+
+from Infra import utils
+from Infra.fuzz import generate_random_command
+from Infra.seeds import ReplayLog, SeedManager, derive_seed, inputs_digest
+from Infra.simulator_wrapper import SimulatorTestRunner
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_derive_seed():
+    assert derive_seed(1, "tests/test_a.py::test[0]") == derive_seed(1, "tests/test_a.py::test[0]")
+    assert derive_seed(1, "tests/test_a.py::test[0]") != derive_seed(1, "tests/test_a.py::test[1]")
+    assert derive_seed(1, "tests/test_a.py::test[0]") != derive_seed(2, "tests/test_a.py::test[0]")
+    assert 0 <= derive_seed(1, "") < 2**64
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_seeded_inputs_are_reproduced():
+    seed_manager = SeedManager(session_seed=7)
+    seed_manager.seed_test("test_id")
+    inputs = [generate_random_command() for _ in range(10)] + [utils.get_random_string(20)]
+    seed_manager.seed_test("test_id")
+    assert [generate_random_command() for _ in range(10)] + [utils.get_random_string(20)] == inputs
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_seeded_diskin_is_reproduced(tmp_path):
+    # Every test of a session shares one disk image, a replayed test uses its logged disk seed
+    runner = SimulatorTestRunner("", "", tmp_path.as_posix())
+    seed_manager = SeedManager(session_seed=3)
+    seed_manager.seed_test("test_a")
+    disk_image = runner.generate_random_diskin_data()
+    first_digest = inputs_digest(tmp_path.as_posix())
+    seed_manager.seed_test("test_b")
+    assert runner.generate_random_diskin_data() is disk_image
+    assert inputs_digest(tmp_path.as_posix()) == first_digest
+
+    replay_manager = SeedManager(session_seed=4, replay_entries={"test_a": (1, seed_manager.disk_seed, "-")})
+    replay_manager.seed_test("test_a")
+    assert runner.generate_random_diskin_data() is disk_image
+    SeedManager(session_seed=4).seed_test("test_a")
+    runner.generate_random_diskin_data()
+    assert inputs_digest(tmp_path.as_posix()) != first_digest
+
+
+@pytest.mark.sanity
+@pytest.mark.assembler
+def test_replay_log(tmp_path):
+    log_path = os.path.join(tmp_path, "replay.log")
+    seed_manager = SeedManager(session_seed=7, replay_log=ReplayLog(log_path))
+    first_seed = seed_manager.seed_test("tests/test_a.py::test[0]")
+    seed_manager.record_failure("tests/test_a.py::test[0]", first_seed, "digest0")
+    seed_manager.record_failure("tests/test_a.py::test[3]", 5, "digest3")
+    assert ReplayLog(log_path).read() == {"tests/test_a.py::test[0]": (first_seed, seed_manager.disk_seed, "digest0"),
+                                          "tests/test_a.py::test[3]": (5, seed_manager.disk_seed, "digest3")}
+
+    # A replay with a different session seed still uses the logged seeds, and runs only the logged tests
+    replay_manager = SeedManager(session_seed=8, replay_entries=ReplayLog(log_path).read())
+    assert replay_manager.should_run("tests/test_a.py::test[3]")
+    assert not replay_manager.should_run("tests/test_a.py::test[1]")
+    assert replay_manager.seed_test("tests/test_a.py::test[0]") == first_seed
+    assert replay_manager.seed_test("tests/test_a.py::test[3]") == 5
+    assert replay_manager.disk_seed_for("tests/test_a.py::test[3]") == seed_manager.disk_seed
+    assert replay_manager.disk_seed_for("tests/test_a.py::test[1]") == replay_manager.disk_seed
+    assert replay_manager.expected_digest("tests/test_a.py::test[3]") == "digest3"
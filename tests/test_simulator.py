@@ -5,7 +5,9 @@ import os
 
 from Infra.assembler_wrapper import AssemblerTestRunner, AssemblyLine, PythonAssemblerTestRunner, OPCODE_TO_NUMBER, REGISTER_TO_NUMBER
 from Infra import utils
-from Infra.simulator_wrapper import SimulatorTestRunner
+from Infra.simulator_wrapper import SimulatorTestRunner, PersistentSimulatorRunner
+from Infra.simulator_pool import SimulatorPool, SimulatorJob
+from Infra.output_cache import OutputCache
 
 
 ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
@@ -27,6 +29,33 @@ def test_simulator_halt(tmp_path):
     runner.run({"$v0":0})
     runner.validate_all_regs_zero()
 
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_cache(tmp_path):
+    cache = OutputCache((tmp_path / "cache").as_posix())
+    for i in range(2):
+        test_folder = tmp_path / f"run_{i}"
+        test_folder.mkdir()
+        runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, test_folder.as_posix(), simulator_cache=cache)
+        runner.set_input_data_from_str(os.linesep.join(["add $t0, $zero, $imm, 5", "halt $zero, $zero, $zero, 0"]))
+        runner.run({"$t0":5})
+    # The second run is served from the cache without executing the simulator
+    assert runner.last_execution is None
+    assert (cache.hits, cache.misses) == (1, 1)
+    runner.compare_directories((tmp_path / "run_0").as_posix())
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_persistent_runner(tmp_path):
+    with PersistentSimulatorRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix()) as runner:
+        memout_inode = os.stat(runner.memout_txt_path).st_ino
+        for value in [3, -7, 0]:
+            runner.run_program(os.linesep.join([f"add $t0, $zero, $imm, {value}", "halt $zero, $zero, $zero, 0"]),
+                               regs_to_validate={"$t0":value})
+        assert os.stat(runner.memout_txt_path).st_ino == memout_inode
+        runner.reset()
+        assert os.path.getsize(runner.regout_txt_path) == 0
+
 @pytest.mark.sanity
 @pytest.mark.simulator
 def test_simulator_add_sanity(tmp_path):
@@ -266,6 +295,21 @@ def test_simulator_word_command_and_lw_int_stress(address, tmp_path):
     runner.set_input_data_from_str(asm_input)
     runner.run({"$t0":address, "$t2":data})
 
+@pytest.mark.simulator
+@pytest.mark.stress
+def test_simulator_word_command_and_lw_int_stress_pool(tmp_path):
+    with SimulatorPool(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix()) as pool:
+        for address in range(6, 2048):
+            data = address%3+35
+            asm_input = os.linesep.join([
+                f"add $t0, $zero, $imm, {address}",
+                f"lw $t2, $t0, $zero, 0",
+                "halt $zero, $zero, $zero, 0",
+                f".word {address} {data}"
+                                         ])
+            pool.submit(SimulatorJob(asm_input, regs_to_validate={"$t0":address, "$t2":data}))
+        pool.run_and_validate()
+
 
 @pytest.mark.simulator
 @pytest.mark.sanity
@@ -474,9 +518,9 @@ IRQ_HANDLER:
     reti $zero, $zero, $zero, 0 #return from irq call"""
     runner.set_input_data_from_str(asm_input)
     runner.run()
-    memout = runner.read_memout()
-    for i in range(SECTOR_SIZE):
-        assert diskin_data[SECTOR_SIZE*sector+i].upper() == memout[ram_buffer_address+i]
+    memout = runner.read_memout_words()
+    mismatches = diskin_data.compare_sector(sector, memout[ram_buffer_address:ram_buffer_address+SECTOR_SIZE])
+    assert not mismatches.size, f"Different words at sector offsets {list(mismatches)}"
 
 
 @pytest.mark.sanity
@@ -572,14 +616,11 @@ IRQ_HANDLER:
     reti $zero, $zero, $zero, 0 #return from irq call"""
     runner.set_input_data_from_str(asm_input)
     runner.run()
-    diskout = runner.read_diskout()
-    memin = runner.read_memin()
-
-    for i in range(SECTOR_SIZE):
-        if ram_buffer_address + i < len(memin):
-            assert diskout[SECTOR_SIZE*sector+i] == memin[ram_buffer_address+i].upper()
-        else:
-            assert diskout[SECTOR_SIZE*sector+i] == b'00000'
+    diskout = runner.read_diskout_image()
+    # memin words are padded with zeros, so words after the end of memin are expected to be zeros
+    memin = runner.read_memin_words()
+    mismatches = diskout.compare_sector(sector, memin[ram_buffer_address:ram_buffer_address+SECTOR_SIZE])
+    assert not mismatches.size, f"Different words at sector offsets {list(mismatches)}"
 
 @pytest.mark.sanity
 @pytest.mark.simulator
@@ -705,4 +746,6 @@ def test_simulator_compare_example_fib(tmp_path):
     runner.copy_irq2_to_test_folder(os.path.join(example_fib_dir, "irq2in.txt"))
     runner.copy_diskin_to_test_folder(os.path.join(example_fib_dir, "diskin.txt"))
     runner.run()
+    trace_difference = runner.diff_trace(example_fib_dir)
+    assert trace_difference is None, str(trace_difference)
     runner.compare_directories(example_fib_dir)
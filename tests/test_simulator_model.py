@@ -0,0 +1,173 @@
+import pytest
+import pathlib
+import random
+import os
+
+import numpy as np
+
+from Infra.assembler_wrapper import Assembler
+from Infra.simulator_model import SimulatorModel, parse_hex_lines
+from Infra.batch_simulator_model import BatchSimulatorModel
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+def run_model(asm_input, diskin="", irq2in=""):
+    memin = Assembler(asm_input).run()
+    return SimulatorModel(memin, diskin, irq2in, max_cycles=100000).run()
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_model_compare_example_fib(tmp_path):
+    model = SimulatorModel.from_files(os.path.join(EXAMPLE_FIB_DIR, "memin.txt"),
+                                      os.path.join(EXAMPLE_FIB_DIR, "diskin.txt"),
+                                      os.path.join(EXAMPLE_FIB_DIR, "irq2in.txt"))
+    model.run()
+    for file_name, data in model.outputs().items():
+        with open(os.path.join(EXAMPLE_FIB_DIR, file_name), "r") as f:
+            expected_data = f.read()
+        assert expected_data == data, file_name
+
+    with open(os.path.join(EXAMPLE_FIB_DIR, "monitor.yuv"), "rb") as f:
+        assert f.read() == bytes(model.monitor)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_model_halt():
+    model = run_model("halt $zero, $zero, $zero, 0")
+    assert model.cycles == 1
+    assert model.regout() == 14 * "00000000\n"
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("item_1", [12, -56, 2**19-1])
+@pytest.mark.parametrize("item_2", [13, -1, 0])
+def test_simulator_model_alu(item_1, item_2):
+    model = run_model(os.linesep.join([
+        f"add $t0, $zero, $imm, {item_1}",
+        f"add $t1, $zero, $imm, {item_2}",
+        f"sub $t2, $t0, $t1, 0",
+        f"mul $s0, $t0, $t1, 0",
+        f"xor $s1, $t0, $t1, 0",
+        f"sra $s2, $t0, $imm, 3",
+        "halt $zero, $zero, $zero, 0"
+    ]))
+    assert model.get_register("$t2") == item_1 - item_2
+    assert model.get_register("$s0") == item_1 * item_2
+    assert model.get_register("$s1") == item_1 ^ item_2
+    assert model.get_register("$s2") == item_1 >> 3
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_model_jal():
+    model = run_model(os.linesep.join([
+        f"add $t2, $zero, $imm, 1",
+        f"jal $ra, $imm, $zero, Exit",
+        f"add $t2, $zero, $imm, 0",
+        f"Exit:",
+        f"halt $zero, $zero, $zero, 0",
+    ]))
+    assert model.get_register("$t2") == 1
+    assert model.get_register("$ra") == 4
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("address", [-1, -9, 23, 1000])
+def test_simulator_model_io_out_of_range(address):
+    # Out of range IO registers read as 0 and ignore writes, negative addresses do not wrap around
+    model = run_model(os.linesep.join([
+        "add $t0, $zero, $imm, 1",
+        f"out $t0, $zero, $imm, {address}",
+        f"in $t1, $zero, $imm, {address}",
+        "halt $zero, $zero, $zero, 0",
+    ]))
+    assert model.get_register("$t1") == 0
+    assert model.hwregtrace == []
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("sector", [0, 5])
+def test_simulator_model_disk_read(sector):
+    diskin = os.linesep.join(f"{x:05X}" for x in range(128*128))
+    model = run_model(os.linesep.join([
+        "add $t0, $zero, $imm, 6",
+        "out $imm, $zero, $t0, IRQ_HANDLER",
+        "add $t0, $zero, $imm, 1",
+        "out $imm, $zero, $t0, 1",
+        "add $t0, $zero, $imm, 15",
+        f"out $imm, $zero, $t0, {sector}",
+        "add $t0, $zero, $imm, 16",
+        "out $imm, $zero, $t0, 256",
+        "add $t0, $zero, $imm, 14",
+        "out $imm, $zero, $t0, 1",
+        "L1:",
+        "beq $imm, $s0, $zero, L1",
+        "halt $zero, $zero, $zero, 0",
+        "IRQ_HANDLER:",
+        "add $s0, $zero, $imm, 1",
+        "reti $zero, $zero, $zero, 0",
+    ]), diskin=diskin)
+    assert model.memory[256:256+128] == list(range(128*sector, 128*(sector+1)))
+    assert model.cycles > 1024
+
+
+def random_alu_program():
+    ops = ["add", "sub", "mul", "and", "or", "xor", "sll", "sra", "srl"]
+    regs = ["$zero", "$imm", "$v0", "$a0", "$t0", "$t1", "$t2", "$s0"]
+    asm_input = [f"add {reg}, $zero, $imm, {random.randint(-2**19, 2**19-1)}" for reg in regs[2:]]
+    for _ in range(20):
+        asm_input.append(f"{random.choice(ops)} {random.choice(regs)}, {random.choice(regs)}, {random.choice(regs)}, "
+                         f"{random.randint(-2**19, 2**19-1)}")
+    asm_input += [
+        "sw $t0, $a0, $imm, 5",
+        "lw $s1, $a0, $imm, 5",
+        "bgt $imm, $t0, $t1, L1",
+        "add $s2, $zero, $imm, 7",
+        "L1:",
+        "jal $ra, $imm, $zero, L2",
+        "L2:",
+        "halt $zero, $zero, $zero, 0",
+    ]
+    return os.linesep.join(asm_input)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_model_batch_compare_to_model():
+    memins = [Assembler(random_alu_program()).run() for _ in range(50)]
+    batch_model = BatchSimulatorModel.from_memins(memins).run()
+    for i, memin in enumerate(memins):
+        model = SimulatorModel(memin).run()
+        assert list(batch_model.registers[i]) == model.registers
+        assert list(batch_model.memory[i]) == model.memory
+        assert batch_model.cycles[i] == model.cycles
+
+
+@pytest.mark.stress
+@pytest.mark.simulator
+def test_simulator_model_batch_add_sweep():
+    number_of_programs = 10000
+    asm_input = os.linesep.join([
+        "add $t0, $zero, $imm, 0",
+        "add $t1, $zero, $imm, 0",
+        "add $t2, $t0, $t1, 0",
+        "halt $zero, $zero, $zero, 0"
+    ])
+    # Assemble once and patch the immediates (words 1 and 3) of every program
+    memory = np.tile(np.array(parse_hex_lines(Assembler(asm_input).run(), 4096), dtype=np.int32), (number_of_programs, 1))
+    numbers_1 = np.random.randint(-2**19, 2**19, number_of_programs)
+    numbers_2 = np.random.randint(-2**19, 2**19, number_of_programs)
+    memory[:, 1] = numbers_1 & 0xFFFFF
+    memory[:, 3] = numbers_2 & 0xFFFFF
+
+    batch_model = BatchSimulatorModel(memory).run()
+    assert (batch_model.get_register("$t2") == numbers_1 + numbers_2).all()
+    assert (batch_model.cycles == 6).all()
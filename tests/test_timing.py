@@ -0,0 +1,95 @@
+import pytest
+import csv
+import json
+import os
+import sys
+
+from Infra.executor import BinaryExecutor
+from Infra.simulator_pool import SimulatorJob, SimulatorPool
+from Infra.simulator_wrapper import SimulatorTestRunner
+from Infra.timing import PhaseStats, TimingRecorder, recorder
+
+
+ASSEMBLER_PATH = "../ComputerOrganizationProcessor/build/assembler"
+SIMULATOR_PATH = "../ComputerOrganizationProcessor/build/simulator"
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_timing_recorder(tmp_path):
+    timing_recorder = TimingRecorder()
+    execution = BinaryExecutor().run([sys.executable, "-c", "bytearray(32 * 1024 * 1024)"])
+    for _ in range(3):
+        with timing_recorder.phase("execute") as record:
+            record.read(10)
+            record.wrote(5)
+            record.add_execution(execution)
+    with pytest.raises(ValueError):
+        with timing_recorder.phase("failing"):
+            raise ValueError()
+
+    report = timing_recorder.report()
+    phases = {phase["phase"]: phase for phase in report["phases"]}
+    assert set(phases) == {"execute", "failing"}
+    assert phases["execute"]["calls"] == 3
+    assert phases["execute"]["bytes_read"] == 30
+    assert phases["execute"]["bytes_written"] == 15
+    assert phases["execute"]["executions"] == 3
+    assert phases["failing"]["calls"] == 1
+    if execution.max_rss is not None:
+        assert phases["execute"]["child_max_rss"] >= 32 * 1024 * 1024
+        assert phases["execute"]["child_user_time"] == pytest.approx(3 * execution.user_time)
+
+    json_path = os.path.join(tmp_path, "report.json")
+    csv_path = os.path.join(tmp_path, "report.csv")
+    timing_recorder.write(json_path)
+    timing_recorder.write(csv_path)
+    with open(json_path, "r") as f:
+        assert [phase["phase"] for phase in json.load(f)["phases"]] == ["execute", "failing"]
+    with open(csv_path, "r", newline="") as f:
+        rows = list(csv.DictReader(f))
+    assert list(rows[0].keys()) == PhaseStats.FIELDS
+    assert [row["calls"] for row in rows] == ["3", "1"]
+
+
+def phase_stats(timing_recorder):
+    return {phase["phase"]: phase for phase in timing_recorder.report()["phases"]}
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_phases(tmp_path):
+    # The global recorder is shared by the session (and its report), so the run is checked by the
+    # difference of its stats
+    before = phase_stats(recorder)
+    runner = SimulatorTestRunner(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix())
+    runner.set_input_data_from_str(f"add $t0, $zero, $imm, 5{os.linesep}halt $zero, $zero, $zero, 0{os.linesep}")
+    runner.run({"$t0": 5})
+    after = phase_stats(recorder)
+
+    def difference(name, field):
+        return after[name][field] - before.get(name, {}).get(field, 0)
+
+    for name in ["simulator.run", "assembler.write_asm", "assembler.execute", "assembler.read_memin",
+                 "simulator.execute", "simulator.read_memout", "simulator.validate_regs"]:
+        assert difference(name, "calls") == 1
+    assert difference("simulator.run", "total_time") >= difference("simulator.execute", "total_time")
+    assert difference("assembler.write_asm", "bytes_written") > 0
+    assert difference("simulator.execute", "bytes_written") == sum(os.path.getsize(path)
+                                                                   for path in runner.output_paths)
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_simulator_pool_phases(tmp_path):
+    # Phases of the worker processes are merged into the recorder of the session
+    before = phase_stats(recorder)
+    with SimulatorPool(ASSEMBLER_PATH, SIMULATOR_PATH, tmp_path.as_posix(), workers=2) as pool:
+        for value in range(3):
+            asm_input = f"add $t0, $zero, $imm, {value}{os.linesep}halt $zero, $zero, $zero, 0{os.linesep}"
+            pool.submit(SimulatorJob(asm_input, regs_to_validate={"$t0": value}))
+        pool.run_and_validate()
+    after = phase_stats(recorder)
+    assert after["simulator.execute"]["calls"] - before.get("simulator.execute", {}).get("calls", 0) == 3
+    assert after["simulator.execute"]["executions"] > before.get("simulator.execute", {}).get("executions", 0)
+
@@ -0,0 +1,77 @@
+import pytest
+import pathlib
+import os
+
+from Infra.output_files import TraceFile
+from Infra.trace_table import TraceTable, find_first_trace_difference, instruction_cycles
+
+
+TESTS_BASE_FOLDER = pathlib.Path(__file__).parent.resolve()
+EXAMPLE_FIB_DIR = os.path.join(TESTS_BASE_FOLDER, "..", "files", "fibexample_300422_win")
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("line_separator", [b"\r\n", b"\n"])
+def test_trace_table_example_fib(line_separator):
+    trace_path = os.path.join(EXAMPLE_FIB_DIR, "trace.txt")
+    with open(trace_path, "rb") as f:
+        data = f.read().replace(b"\r\n", line_separator)
+    table = TraceTable.parse(data)
+    with TraceFile(trace_path) as trace:
+        assert len(table) == len(trace)
+        for row, record in enumerate(trace.records()):
+            assert (table.pc[row], table.instruction[row]) == (record.pc, record.instruction)
+            assert list(table.registers[row]) == record.registers
+
+    # The cycle of the last instruction plus its own cycles is the total amount of cycles
+    with open(os.path.join(EXAMPLE_FIB_DIR, "cycles.txt"), "r") as f:
+        assert table.cycle[-1] + instruction_cycles(table.instruction[-1:])[0] == int(f.read())
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_trace_table_queries():
+    table = TraceTable.parse(os.linesep.join([
+        f"{pc:03X} 00000 " + " ".join(f"{value:08X}" for value in [0, 0, 0, 0, 0, 0, 0, t0] + [0] * 8)
+        for pc, t0 in [(0, 0), (1, 5), (2, 5), (1, 0xFFFFFFFF), (2, 7)]
+    ]))
+    assert list(table.rows_where_pc(1)) == [1, 3]
+    assert list(table.cycles_where_pc(2)) == [2, 4]
+    assert table.first_row_with_value("$t0", -1) == 3
+    assert table.first_cycle_with_value("$t0", 6) is None
+    assert list(table.change_points("$t0")) == [1, 3, 4]
+    assert table.signed_register("$t0")[3] == -1
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+@pytest.mark.parametrize("line_separator", [b"\r\n", b"\n"])
+@pytest.mark.parametrize("row", [0, 1, 400, 846])
+def test_find_first_trace_difference(tmp_path, line_separator, row):
+    trace_path = os.path.join(EXAMPLE_FIB_DIR, "trace.txt")
+    with open(trace_path, "rb") as f:
+        lines = f.read().splitlines()
+    candidate_path = tmp_path / "trace.txt"
+    candidate_path.write_bytes(line_separator.join(lines) + line_separator)
+    assert find_first_trace_difference(trace_path, candidate_path.as_posix()) is None
+
+    # $t0 of a single row is different, the traces converge again after it
+    lines[row] = lines[row][:73] + b"F" + lines[row][74:]
+    candidate_path.write_bytes(line_separator.join(lines) + line_separator)
+    difference = find_first_trace_difference(trace_path, candidate_path.as_posix())
+    assert difference.row == row
+    assert difference.cycle == TraceTable.from_file(trace_path).cycle[row]
+    assert [reg for reg, _, _ in difference.different_registers] == ["$t0"]
+
+
+@pytest.mark.sanity
+@pytest.mark.simulator
+def test_find_first_trace_difference_shorter_trace(tmp_path):
+    trace_path = os.path.join(EXAMPLE_FIB_DIR, "trace.txt")
+    with open(trace_path, "rb") as f:
+        lines = f.read().splitlines()
+    candidate_path = tmp_path / "trace.txt"
+    candidate_path.write_bytes(b"\n".join(lines[:500]))
+    difference = find_first_trace_difference(trace_path, candidate_path.as_posix())
+    assert (difference.row, difference.candidate_record) == (500, None)